@@ -0,0 +1,8 @@
+"""Corpus tooling behind the book's maintenance slash commands.
+
+Every command operates on the markdown tree under ``KNOWLEDGE_BASE_ROOT``
+(see ``settings.json``) and keeps its derived state in ``.booktools/`` so
+that repeated runs only touch the files an agent actually changed.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,35 @@
+"""Command-line entry point: ``python -m booktools <command>``."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Sequence
+
+from booktools import codeblocks, context, export, links, lint, overlap, related, search, site, toc
+
+COMMANDS = (toc, site, search, links, lint, context, overlap, codeblocks, related, export)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="booktools",
+        description="Maintenance tooling for the Agentic Engineering book.",
+    )
+    parser.add_argument(
+        "--root",
+        help="knowledge base root (defaults to KNOWLEDGE_BASE_ROOT from settings.json)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for module in COMMANDS:
+        module.register(subparsers)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
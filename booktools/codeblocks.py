@@ -0,0 +1,382 @@
+"""Extract every fenced code block and check that it at least parses.
+
+Extraction reads each file once and reuses :mod:`booktools.markdown`'s fence
+and heading scanning, recording every block's language tag, opening line,
+and enclosing heading.  Per-file block lists are cached by
+content hash, and validation results by *block* hash, so an unchanged block
+is never re-checked even when the prose around it changes.  Uncached blocks
+are validated in a process pool.
+
+Validators by language tag:
+
+- ``python``/``py``: :func:`ast.parse`
+- ``json``: :func:`json.loads`
+- ``yaml``/``yml``: ``yaml.safe_load_all`` (needs PyYAML; reported as
+  ``unavailable`` otherwise, and never cached)
+- ``bash``/``sh``/``shell``/``zsh``: ``bash -n``
+- ``javascript``/``js``: ``node --check`` when ``node`` is on ``PATH``
+- ``xml``: :mod:`xml.etree.ElementTree`, wrapped so fragments parse
+
+Other tags (``markdown``, ``typescript``, ``sql`` ...) are counted but not
+checked.  Put ``<!-- code: skip -->`` on the line before a fence to exempt an
+intentionally partial example.  A fence that is never closed is always a
+failure: it swallows the rest of the document.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import bisect
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from booktools import markdown
+from booktools.corpus import (
+    cache_dir,
+    content_hash,
+    knowledge_base_root,
+    relative_paths,
+    scan_documents,
+    split_frontmatter,
+    stat_paths,
+)
+
+try:  # optional: YAML blocks are reported as unavailable without it
+    import yaml
+except ImportError:  # pragma: no cover - depends on the environment
+    yaml = None
+
+VALIDATOR_VERSION = "1"
+CACHE_FILE = "code.json"
+PARALLEL_THRESHOLD = 16
+SKIP_MARKER = "<!-- code: skip -->"
+
+@dataclass(frozen=True)
+class Block:
+    path: str
+    line: int
+    lang: str
+    heading: str
+    digest: str
+    skip: bool = False
+    closed: bool = True
+
+
+@dataclass(frozen=True)
+class Result:
+    status: str
+    message: str = ""
+    line: int = 0
+
+
+def extract(rel: str, text: str) -> Iterator[tuple[Block, str]]:
+    """Stream fenced blocks out of one document as ``(block, source)``."""
+    _, body, first_line = split_frontmatter(text)
+    lines = body.splitlines()
+    headings, _ = markdown.scan(lines, first_line)
+    starts = [heading.line for heading in headings]
+    for fence in markdown.iter_fences(lines, first_line):
+        index = bisect.bisect_left(starts, fence.line)
+        heading = headings[index - 1].text if index else ""
+        previous = next(
+            (line for line in reversed(lines[: fence.line - first_line]) if line.strip()), ""
+        )
+        skip = previous.strip() == SKIP_MARKER or "skip-validate" in fence.info
+        digest = content_hash(f"{fence.lang}\0{fence.source}".encode())
+        yield Block(rel, fence.line, fence.lang, heading, digest, skip, fence.closed), fence.source
+
+
+# ---------------------------------------------------------------------------
+# Validators
+# ---------------------------------------------------------------------------
+
+
+def _python(source: str) -> Result:
+    try:
+        ast.parse(source)
+    except SyntaxError as exc:
+        return Result("fail", exc.msg, exc.lineno or 0)
+    return Result("pass")
+
+
+def _json(source: str) -> Result:
+    # A leading ``// path/to/file.json`` label is a book convention, not content.
+    lines = source.split("\n")
+    for n, line in enumerate(lines):
+        if not line.lstrip().startswith("//"):
+            break
+        lines[n] = ""
+    try:
+        json.loads("\n".join(lines))
+    except ValueError as exc:
+        return Result("fail", exc.msg, exc.lineno)
+    return Result("pass")
+
+
+def _yaml(source: str) -> Result:
+    if yaml is None:
+        return Result("unavailable", "PyYAML is not installed")
+    try:
+        for _ in yaml.safe_load_all(source):
+            pass
+    except yaml.YAMLError as exc:
+        mark = getattr(exc, "problem_mark", None)
+        problem = getattr(exc, "problem", None) or str(exc).splitlines()[0]
+        return Result("fail", problem, mark.line + 1 if mark else 0)
+    return Result("pass")
+
+
+def _bash(source: str) -> Result:
+    proc = subprocess.run(
+        ["bash", "-n"], input=source, capture_output=True, text=True, timeout=10
+    )
+    if proc.returncode == 0:
+        return Result("pass")
+    message = proc.stderr.strip().splitlines()[0] if proc.stderr.strip() else "syntax error"
+    match = re.search(r"line (\d+):\s*(.*)", message)
+    if match:
+        return Result("fail", match.group(2), int(match.group(1)))
+    return Result("fail", message)
+
+
+def _javascript(source: str) -> Result:
+    if shutil.which("node") is None:
+        return Result("unavailable", "node is not installed")
+    suffix = ".mjs" if re.search(r"^\s*(import|export)\b", source, re.M) else ".cjs"
+    with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as handle:
+        handle.write(source)
+    try:
+        proc = subprocess.run(
+            ["node", "--check", handle.name], capture_output=True, text=True, timeout=10
+        )
+    finally:
+        os.unlink(handle.name)
+    if proc.returncode == 0:
+        return Result("pass")
+    lines = proc.stderr.strip().splitlines()
+    match = re.search(r":(\d+)$", lines[0]) if lines else None
+    message = next((l for l in lines if "Error" in l), lines[-1] if lines else "syntax error")
+    return Result("fail", message.strip(), int(match.group(1)) if match else 0)
+
+
+def _xml(source: str) -> Result:
+    body = re.sub(r"^\s*<\?xml[^>]*\?>", "", source)
+    try:
+        ElementTree.fromstring(f"<fragment>{body}</fragment>")
+    except ElementTree.ParseError as exc:
+        line, _ = exc.position
+        return Result("fail", str(exc).split(":")[0], line)
+    return Result("pass")
+
+
+VALIDATORS: dict[str, Callable[[str], Result]] = {
+    "python": _python,
+    "py": _python,
+    "json": _json,
+    "yaml": _yaml,
+    "yml": _yaml,
+    "bash": _bash,
+    "sh": _bash,
+    "shell": _bash,
+    "zsh": _bash,
+    "javascript": _javascript,
+    "js": _javascript,
+    "xml": _xml,
+}
+
+
+def validate(job: tuple[str, str]) -> tuple[str, dict[str, Any]]:
+    """Process-pool worker: ``(lang, source)`` -> result for the block."""
+    lang, source = job
+    validator = VALIDATORS.get(lang)
+    result = validator(source) if validator else Result("unchecked")
+    return content_hash(f"{lang}\0{source}".encode()), asdict(result)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Report:
+    blocks: list[tuple[Block, Result]]
+    validated: int
+    rescanned: int
+    elapsed: float = 0.0
+
+    def counts(self) -> dict[str, Counter]:
+        by_lang: dict[str, Counter] = {}
+        for block, result in self.blocks:
+            status = "skipped" if block.skip else result.status
+            by_lang.setdefault(block.lang or "(none)", Counter())[status] += 1
+        return dict(sorted(by_lang.items()))
+
+    def failures(self) -> list[tuple[Block, Result]]:
+        return [(b, r) for b, r in self.blocks if r.status == "fail" and not b.skip]
+
+
+def check_tree(root: Path, paths: list[str] | None = None, jobs: int | None = None) -> Report:
+    started = time.perf_counter()
+    cache_path = cache_dir(root) / CACHE_FILE
+    try:
+        data = json.loads(cache_path.read_text("utf-8"))
+        valid = data.get("version") == VALIDATOR_VERSION
+        files = data["files"] if valid else {}
+        results = data["results"] if valid else {}
+    except (OSError, ValueError, KeyError):
+        files, results = {}, {}
+
+    documents = stat_paths(root, paths)[0] if paths else scan_documents(root)
+    blocks: list[Block] = []
+    pending: dict[str, tuple[str, str]] = {}
+    rescanned = 0
+    seen_files = {}
+    for rel, st in documents:
+        cached = files.get(rel)
+        fresh_file = not (
+            cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size
+        )
+        if not fresh_file:
+            file_blocks = [Block(rel, *row) for row in cached["blocks"]]
+            seen_files[rel] = cached
+            # Blocks whose validator was unavailable last time have no
+            # cached result; re-extract the file so they are retried.
+            fresh_file = any(b.digest not in results and b.closed and not b.skip for b in file_blocks)
+        if fresh_file:
+            text = (root / rel).read_text("utf-8")
+            file_blocks = []
+            for block, source in extract(rel, text):
+                file_blocks.append(block)
+                if block.digest not in results and block.closed and not block.skip:
+                    pending[block.digest] = (block.lang, source)
+            seen_files[rel] = {
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "blocks": [
+                    [b.line, b.lang, b.heading, b.digest, b.skip, b.closed] for b in file_blocks
+                ],
+            }
+            rescanned += 1
+        blocks.extend(file_blocks)
+
+    jobs_list = list(pending.values())
+    workers = jobs or os.cpu_count() or 1
+    if len(jobs_list) >= PARALLEL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            validated = list(pool.map(validate, jobs_list, chunksize=4))
+    else:
+        validated = [validate(job) for job in jobs_list]
+    fresh = dict(validated)
+    # A missing tool is a property of this machine, not of the block: keep
+    # such results out of the cache so installing the tool takes effect.
+    results.update((k, v) for k, v in validated if v["status"] != "unavailable")
+
+    if rescanned or validated:
+        if not paths:
+            files = seen_files
+        else:
+            files.update(seen_files)
+        live = {row[3] for info in files.values() for row in info["blocks"]}
+        tmp = cache_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "version": VALIDATOR_VERSION,
+                    "files": files,
+                    "results": {k: v for k, v in results.items() if k in live},
+                },
+                separators=(",", ":"),
+            ),
+            "utf-8",
+        )
+        os.replace(tmp, cache_path)
+
+    paired = []
+    for block in blocks:
+        if not block.closed:
+            result = Result("fail", "code fence is never closed")
+        elif block.digest in fresh or block.digest in results:
+            result = Result(**fresh.get(block.digest) or results[block.digest])
+        else:
+            result = Result("skipped")
+        paired.append((block, result))
+    return Report(paired, len(validated), rescanned, time.perf_counter() - started)
+
+
+def run(args: argparse.Namespace) -> int:
+    root = knowledge_base_root(args.root)
+    paths = relative_paths(root, args.paths, "code")
+    if paths is None:
+        return 2
+    if paths:
+        found, missing = stat_paths(root, paths)
+        for rel in missing:
+            print(f"code: skipping {rel}: no such file", file=sys.stderr)
+        paths = [rel for rel, _ in found]
+        if not paths:
+            return 0
+    report = check_tree(root, paths or None, args.jobs)
+    failures = report.failures()
+    if args.json:
+        json.dump(
+            {
+                "blocks": len(report.blocks),
+                "validated": report.validated,
+                "elapsed_ms": round(report.elapsed * 1000, 2),
+                "languages": {lang: dict(c) for lang, c in report.counts().items()},
+                "failures": [
+                    {
+                        "path": b.path,
+                        "line": b.line + max(r.line, 1),
+                        "fence_line": b.line,
+                        "lang": b.lang,
+                        "heading": b.heading,
+                        "message": r.message,
+                    }
+                    for b, r in failures
+                ],
+            },
+            sys.stdout,
+            indent=2,
+        )
+        sys.stdout.write("\n")
+    else:
+        for block, result in failures:
+            line = block.line + max(result.line, 1)
+            print(f"{block.path}:{line}: [{block.lang}] {result.message} (under \"{block.heading}\")")
+        if args.verbose:
+            for lang, counter in report.counts().items():
+                summary = ", ".join(f"{k} {v}" for k, v in sorted(counter.items()))
+                print(f"  {lang:<12} {summary}", file=sys.stderr)
+    print(
+        f"code: {len(report.blocks)} blocks ({report.validated} validated, "
+        f"{report.rescanned} files re-scanned), {len(failures)} failing, "
+        f"in {report.elapsed * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 1 if failures else 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "code", help="extract fenced code blocks and check that they parse"
+    )
+    parser.add_argument("paths", nargs="*", help="documents to check (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, help="validator processes (default: CPU count)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print per-language counts")
+    parser.add_argument("--json", action="store_true", help="emit a JSON report")
+    parser.set_defaults(func=run)
@@ -0,0 +1,326 @@
+"""Token-budgeted context packs assembled from book sections.
+
+The section index (``.booktools/context/sections.json``) records, for every
+heading in every entry, its byte range, an estimated token count, the entry's
+frontmatter ``tags``, and the entry's ``order``.  Packing never parses
+markdown: it scores sections (tag overlap plus BM25 relevance from the
+search index), picks the best value-per-token set that fits the budget, and
+slices the chosen byte ranges straight out of the source files.
+
+Token counts come from ``tiktoken`` when it is installed and its encoding
+loads (on first use, so commands that never count tokens never touch it),
+and from a conservative word/punctuation estimate otherwise; the estimator
+is recorded in the index so switching invalidates it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from booktools import markdown, search
+from booktools.corpus import CACHE_DIR, knowledge_base_root, load_index, order_key, split_frontmatter
+
+try:  # optional: exact counts for OpenAI-style BPE vocabularies
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the environment
+    tiktoken = None
+
+INDEX_VERSION = 1
+INDEX_FILE = "sections.json"
+TAG_WEIGHT = 2.0
+HEADING_TAG_BONUS = 0.5
+MIN_SECTION_TOKENS = 24
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+_ENCODING: Any = None
+# Until the encoding has loaded this is only the intended estimator; read it
+# through :func:`estimator`.
+ESTIMATOR = "tiktoken:cl100k_base" if tiktoken is not None else "heuristic"
+
+
+def _encoding() -> Any:
+    """The BPE encoding, loaded on first use; ``None`` means "use the heuristic".
+
+    ``tiktoken`` fetches the encoding file on first use, so loading can fail
+    offline; the pack then falls back to the estimate instead of crashing.
+    """
+    global _ENCODING, ESTIMATOR
+    if _ENCODING is None and ESTIMATOR != "heuristic":
+        try:
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception as exc:  # network, cache, and plugin errors all vary
+            print(f"pack: tiktoken unavailable ({exc.__class__.__name__}); estimating tokens", file=sys.stderr)
+            ESTIMATOR = "heuristic"
+    return _ENCODING
+
+
+def estimator() -> str:
+    """Name of the token counter actually in use (recorded in the index)."""
+    _encoding()
+    return ESTIMATOR
+
+
+def count_tokens(text: str) -> int:
+    """Exact BPE count with tiktoken; otherwise an upper-leaning estimate.
+
+    The estimate is the larger of word/punctuation pieces and chars/4.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(len(_PIECE_RE.findall(text)), math.ceil(len(text) / 4))
+
+
+@dataclass(frozen=True)
+class SectionRef:
+    path: str
+    heading: str
+    level: int
+    slug: str
+    line: int
+    start: int
+    end: int
+    tokens: int
+    tags: tuple[str, ...]
+    order: str
+
+    @property
+    def anchor(self) -> str:
+        return f"{self.path}#{self.slug}" if self.slug else self.path
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+
+def index_file(data: bytes) -> list[list[Any]]:
+    """Section rows for one file: ``[heading, level, slug, line, start, end, tokens]``."""
+    _, _, body_line = split_frontmatter(data.decode("utf-8"))
+    rows = []
+    for section in markdown.split_sections(data, body_line):
+        text = data[section.start : section.end].decode("utf-8")
+        rows.append(
+            [
+                section.heading,
+                section.level,
+                section.slug,
+                section.line,
+                section.start,
+                section.end,
+                count_tokens(text),
+            ]
+        )
+    return rows
+
+
+class SectionIndex:
+    def __init__(self, root: Path):
+        self.root = root
+        self.files: dict[str, dict[str, Any]] = {}
+        self.reindexed = 0
+
+    @property
+    def path(self) -> Path:
+        return self.root / CACHE_DIR / "context" / INDEX_FILE
+
+    def refresh(self) -> "SectionIndex":
+        corpus = load_index(self.root)
+        try:
+            data = json.loads(self.path.read_text("utf-8"))
+            valid = data.get("version") == INDEX_VERSION and data.get("estimator") == estimator()
+            previous = data["files"] if valid else {}
+        except (OSError, ValueError, KeyError):
+            previous = {}
+        for rel, entry in sorted(corpus.entries.items()):
+            tags = [str(t) for t in entry.meta.get("tags") or []]
+            order = str(entry.meta.get("order", ""))
+            cached = previous.get(rel)
+            if cached and cached["digest"] == entry.digest:
+                cached["tags"], cached["order"] = tags, order
+                self.files[rel] = cached
+                continue
+            self.files[rel] = {
+                "digest": entry.digest,
+                "tags": tags,
+                "order": order,
+                "sections": index_file((self.root / rel).read_bytes()),
+            }
+            self.reindexed += 1
+        if self.reindexed or set(previous) != set(self.files):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(
+                json.dumps(
+                    {"version": INDEX_VERSION, "estimator": estimator(), "files": self.files},
+                    separators=(",", ":"),
+                ),
+                "utf-8",
+            )
+            os.replace(tmp, self.path)
+        return self
+
+    def sections(self) -> Iterable[SectionRef]:
+        for rel, info in self.files.items():
+            tags = tuple(info["tags"])
+            for heading, level, slug, line, start, end, tokens in info["sections"]:
+                yield SectionRef(rel, heading, level, slug, line, start, end, tokens, tags, info["order"])
+
+
+# ---------------------------------------------------------------------------
+# Packing
+# ---------------------------------------------------------------------------
+
+_SOURCE_MARK = "<!-- source: {anchor} -->\n"
+
+
+@dataclass
+class Pack:
+    budget: int
+    sections: list[SectionRef] = field(default_factory=list)
+    scores: dict[str, float] = field(default_factory=dict)
+    tokens: int = 0
+
+    def render(self, root: Path) -> str:
+        """Slice every chosen section out of its file, in reading order."""
+        parts = []
+        handles: dict[str, Any] = {}
+        try:
+            for ref in self.sections:
+                handle = handles.get(ref.path)
+                if handle is None:
+                    handle = handles[ref.path] = open(root / ref.path, "rb")
+                handle.seek(ref.start)
+                body = handle.read(ref.end - ref.start).decode("utf-8").strip("\n")
+                parts.append(_SOURCE_MARK.format(anchor=ref.anchor) + body + "\n")
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return "\n".join(parts)
+
+    def manifest(self) -> dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "tokens": self.tokens,
+            "estimator": estimator(),
+            "sections": [
+                {**asdict(ref), "score": round(self.scores.get(ref.anchor, 0.0), 4)}
+                for ref in self.sections
+            ],
+        }
+
+
+def _overhead(ref: SectionRef) -> int:
+    return count_tokens(_SOURCE_MARK.format(anchor=ref.anchor)) + 1
+
+
+def build_pack(
+    root: Path,
+    budget: int,
+    tags: Iterable[str] = (),
+    query: str = "",
+    index: SectionIndex | None = None,
+    min_score: float = 0.0,
+) -> Pack:
+    """Choose the sections that best match ``tags``/``query`` within ``budget`` tokens.
+
+    Sections are ranked by score per token (so one focused subsection beats
+    a sprawling one of similar relevance) and added greedily while they fit;
+    the result is returned in reading order.  Heading-only stubs and
+    source lists are never packed.  The rendered pack, including
+    the per-section source markers, never exceeds ``budget``.
+    """
+    index = index or SectionIndex(root).refresh()
+    wanted = {t.lower() for t in tags}
+    relevance: dict[tuple[str, int], float] = {}
+    if query:
+        search.refresh(root)
+        with search.SearchIndex(root / CACHE_DIR / "search" / search.INDEX_FILE) as searcher:
+            scores = searcher.scores(search.tokenize(query))
+            top = max(scores.values(), default=0.0) or 1.0
+            for doc_id, score in scores.items():
+                path, _, _, _, _, start, _ = searcher.record(doc_id)
+                relevance[(path, start)] = score / top
+
+    candidates = []
+    for ref in index.sections():
+        if ref.tokens < MIN_SECTION_TOKENS or ref.heading.lower() in markdown.REFERENCE_HEADINGS:
+            continue
+        score = relevance.get((ref.path, ref.start), 0.0)
+        if wanted:
+            overlap = len(wanted.intersection(t.lower() for t in ref.tags))
+            if overlap:
+                score += TAG_WEIGHT * overlap / len(wanted)
+                if any(tag in ref.slug for tag in wanted):
+                    score += HEADING_TAG_BONUS
+        if score <= min_score:
+            continue
+        cost = ref.tokens + _overhead(ref)
+        if cost > budget:
+            continue
+        candidates.append((score / cost, score, cost, ref))
+
+    candidates.sort(key=lambda c: (-c[0], -c[1], c[3].path, c[3].start))
+    pack = Pack(budget)
+    remaining = budget
+    for _, score, cost, ref in candidates:
+        if cost <= remaining:
+            pack.sections.append(ref)
+            pack.scores[ref.anchor] = score
+            remaining -= cost
+    pack.tokens = budget - remaining
+    order_of = {rel: info["order"] for rel, info in index.files.items()}
+    pack.sections.sort(key=lambda r: (order_key(order_of[r.path]), r.path, r.start))
+    return pack
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    tags = [t for chunk in args.tag or () for t in chunk.split(",") if t]
+    query = " ".join(args.query)
+    if not tags and not query:
+        print("pack: give at least one --tag or a query", file=sys.stderr)
+        return 2
+    index = SectionIndex(root).refresh()
+    pack = build_pack(root, args.budget, tags=tags, query=query, index=index)
+    if args.json:
+        manifest = pack.manifest()
+        if args.with_text:
+            manifest["text"] = pack.render(root)
+        json.dump(manifest, sys.stdout, separators=(",", ":"))
+        sys.stdout.write("\n")
+    else:
+        sys.stdout.write(pack.render(root))
+    print(
+        f"pack: {len(pack.sections)} sections, {pack.tokens}/{args.budget} tokens "
+        f"({estimator()}; {index.reindexed} files re-indexed) "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0 if pack.sections else 1
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "pack", help="assemble a token-budgeted context pack of book sections"
+    )
+    parser.add_argument("query", nargs="*", help="free-text relevance query")
+    parser.add_argument(
+        "-t", "--tag", action="append", help="frontmatter tag to match (repeatable or comma-separated)"
+    )
+    parser.add_argument("-b", "--budget", type=int, default=4000, help="token budget")
+    parser.add_argument("--json", action="store_true", help="emit the pack manifest as JSON")
+    parser.add_argument(
+        "--with-text", action="store_true", help="include the rendered pack in --json output"
+    )
+    parser.set_defaults(func=run)
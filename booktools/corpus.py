@@ -0,0 +1,381 @@
+"""Corpus discovery, frontmatter parsing, and the persistent frontmatter index.
+
+The frontmatter index is the shared foundation for the other commands: it
+records, for every markdown file under ``chapters/`` and ``appendices/``, the
+file's mtime, size, content hash, and parsed frontmatter.  A refresh only
+re-reads files whose ``stat`` changed and only re-parses files whose content
+hash changed, so the cost of a run tracks the size of the edit rather than
+the size of the book.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+SETTINGS_FILE = "settings.json"
+ROOT_ENV = "KNOWLEDGE_BASE_ROOT"
+CACHE_DIR = ".booktools"
+SOURCE_DIRS = ("chapters", "appendices")
+ROOT_DOCUMENTS = (
+    "README.md",
+    "PREFACE.md",
+    "TABLE_OF_CONTENTS.md",
+    "CURRICULUM.md",
+    "RUBRIC.md",
+    "STYLE_GUIDE.md",
+    "CONTRIBUTING.md",
+)
+INDEX_FILE = "frontmatter.json"
+INDEX_VERSION = 1
+
+_INT_RE = re.compile(r"-?\d+")
+
+
+# ---------------------------------------------------------------------------
+# Locations
+# ---------------------------------------------------------------------------
+
+
+def knowledge_base_root(explicit: str | os.PathLike[str] | None = None) -> Path:
+    """Resolve the knowledge base root.
+
+    Precedence: an explicit path, the ``KNOWLEDGE_BASE_ROOT`` environment
+    variable, the ``env`` block of the nearest ``settings.json`` (relative to
+    that file), and finally the current directory.
+    """
+    if explicit:
+        return Path(explicit).resolve()
+    env_root = os.environ.get(ROOT_ENV)
+    if env_root:
+        return Path(env_root).resolve()
+    cwd = Path.cwd().resolve()
+    for directory in (cwd, *cwd.parents):
+        settings = directory / SETTINGS_FILE
+        if settings.is_file():
+            try:
+                configured = json.loads(settings.read_text("utf-8"))["env"][ROOT_ENV]
+            except (OSError, ValueError, KeyError, TypeError):
+                break
+            return (directory / configured).resolve()
+    return cwd
+
+
+def cache_dir(root: Path) -> Path:
+    """Return (and create) the directory holding derived indexes."""
+    path = root / CACHE_DIR
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def scan_sources(root: Path) -> list[tuple[str, os.stat_result]]:
+    """Return ``(path, stat)`` for every markdown source, sorted by path.
+
+    Paths are root-relative POSIX strings.  ``os.scandir`` supplies the stat
+    results, so a scan costs one directory listing per folder.
+    """
+    prefix = len(str(root)) + 1
+    found: list[tuple[str, os.stat_result]] = []
+    for top in SOURCE_DIRS:
+        stack = [os.path.join(root, top)]
+        if not os.path.isdir(stack[0]):
+            continue
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".md"):
+                        rel = entry.path[prefix:].replace(os.sep, "/")
+                        found.append((rel, entry.stat()))
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def scan_documents(root: Path) -> list[tuple[str, os.stat_result]]:
+    """Like :func:`scan_sources`, plus the top-level documents that exist."""
+    found = scan_sources(root)
+    for rel in ROOT_DOCUMENTS:
+        try:
+            found.append((rel, os.stat(root / rel)))
+        except FileNotFoundError:
+            continue
+    return found
+
+
+def stat_paths(
+    root: Path, paths: list[str]
+) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+    """Stat explicit root-relative paths; returns ``(found, missing)``.
+
+    Gates fed ``git diff --name-only`` pass deleted and renamed paths, which
+    callers should skip rather than crash on.
+    """
+    found: list[tuple[str, os.stat_result]] = []
+    missing: list[str] = []
+    for rel in paths:
+        try:
+            found.append((rel, os.stat(root / rel)))
+        except FileNotFoundError:
+            missing.append(rel)
+    return found, missing
+
+
+def relative_paths(root: Path, paths: list[str], command: str) -> list[str] | None:
+    """Turn command-line paths into root-relative POSIX paths.
+
+    Returns ``None`` after reporting the first path outside ``root``;
+    callers exit 2, as for any other usage error.
+    """
+    relative = []
+    for path in paths:
+        try:
+            relative.append(Path(os.path.abspath(path)).relative_to(root).as_posix())
+        except ValueError:
+            print(f"{command}: {path} is outside {root}", file=sys.stderr)
+            return None
+    return relative
+
+
+def iter_sources(root: Path) -> Iterator[str]:
+    """Yield root-relative POSIX paths of every markdown source, sorted."""
+    for rel, _ in scan_sources(root):
+        yield rel
+
+
+# ---------------------------------------------------------------------------
+# Frontmatter
+# ---------------------------------------------------------------------------
+
+
+def content_hash(data: bytes) -> str:
+    """Stable content digest used as the cache key across all indexes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def split_frontmatter(text: str) -> tuple[str, str, int]:
+    """Split ``text`` into ``(frontmatter, body, body_line)``.
+
+    ``body_line`` is the 1-based line number where the body starts.  Text
+    without a leading ``---`` block yields an empty frontmatter.
+    """
+    if not text.startswith("---"):
+        return "", text, 1
+    end = text.find("\n---", 3)
+    if end == -1:
+        return "", text, 1
+    close = text.find("\n", end + 4)
+    close = len(text) if close == -1 else close + 1
+    header = text[text.find("\n") + 1 : end + 1]
+    return header, text[close:], text.count("\n", 0, close) + 1
+
+
+def _scalar(raw: str) -> Any:
+    value = raw.strip()
+    if not value:
+        return ""
+    if value[0] in "\"'" and value[-1] == value[0] and len(value) > 1:
+        inner = value[1:-1]
+        if value[0] == '"':
+            return inner.replace('\\"', '"').replace("\\\\", "\\")
+        return inner.replace("''", "'")
+    if value.startswith("[") and value.endswith("]"):
+        return [_scalar(item) for item in value[1:-1].split(",") if item.strip()]
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    return value
+
+
+def parse_frontmatter(header: str) -> dict[str, Any]:
+    """Parse the flat ``key: value`` YAML subset the book's frontmatter uses.
+
+    Supports quoted and bare scalars, integers, inline ``[a, b]`` lists, and
+    block lists (``- item`` lines).  Anything richer is kept as a string.
+    """
+    meta: dict[str, Any] = {}
+    current: str | None = None
+    for line in header.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and current is not None:
+            if not isinstance(meta.get(current), list):
+                meta[current] = []
+            meta[current].append(_scalar(stripped[2:]))
+            continue
+        key, sep, value = line.partition(":")
+        if not sep or line[:1].isspace():
+            continue
+        current = key.strip()
+        meta[current] = _scalar(value)
+    return meta
+
+
+def order_key(order: Any) -> tuple[int, ...]:
+    """Turn an ``order`` value such as ``"2.6.10"`` into a sortable tuple."""
+    if order in (None, ""):
+        return ()
+    parts = []
+    for piece in str(order).split("."):
+        parts.append(int(piece) if piece.isdigit() else 0)
+    return tuple(parts)
+
+
+# ---------------------------------------------------------------------------
+# Persistent index
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Entry:
+    """One indexed source file."""
+
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def order(self) -> tuple[int, ...]:
+        return order_key(self.meta.get("order"))
+
+    @property
+    def title(self) -> str:
+        return str(self.meta.get("title") or Path(self.path).stem)
+
+
+@dataclass
+class RefreshStats:
+    """What a refresh did, for the timing line each command prints."""
+
+    total: int = 0
+    reused: int = 0
+    rehashed: int = 0
+    parsed: int = 0
+    removed: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} entries ({self.reused} reused, {self.parsed} parsed, "
+            f"{self.removed} removed) in {self.elapsed * 1000:.1f} ms"
+        )
+
+
+class FrontmatterIndex:
+    """Frontmatter for every source file, persisted under ``.booktools/``.
+
+    Entries are keyed by path and validated by ``(mtime_ns, size)`` first and
+    by content hash second, so touching a file without changing it costs one
+    read and no parse.
+    """
+
+    def __init__(self, root: Path, entries: dict[str, Entry] | None = None):
+        self.root = root
+        self.entries: dict[str, Entry] = entries or {}
+        self.stats = RefreshStats()
+        self.changed: set[str] = set()
+
+    @property
+    def path(self) -> Path:
+        return self.root / CACHE_DIR / INDEX_FILE
+
+    @classmethod
+    def load(cls, root: Path) -> "FrontmatterIndex":
+        index = cls(root)
+        try:
+            data = json.loads(index.path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.entries = {
+            path: Entry(path=path, **fields) for path, fields in data["entries"].items()
+        }
+        return index
+
+    def save(self) -> None:
+        payload = {
+            "version": INDEX_VERSION,
+            "entries": {
+                path: {
+                    "mtime_ns": entry.mtime_ns,
+                    "size": entry.size,
+                    "digest": entry.digest,
+                    "meta": entry.meta,
+                }
+                for path, entry in sorted(self.entries.items())
+            },
+        }
+        cache_dir(self.root)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), "utf-8")
+        os.replace(tmp, self.path)
+
+    def refresh(self) -> RefreshStats:
+        """Bring the index in line with the tree; returns what was done.
+
+        Paths whose content changed (or appeared) are collected in
+        :attr:`changed` for downstream incremental consumers.
+        """
+        started = time.perf_counter()
+        stats = RefreshStats()
+        self.changed = set()
+        seen: set[str] = set()
+        for rel, st in scan_sources(self.root):
+            seen.add(rel)
+            cached = self.entries.get(rel)
+            if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                stats.reused += 1
+                continue
+            data = (self.root / rel).read_bytes()
+            digest = content_hash(data)
+            if cached and cached.digest == digest:
+                cached.mtime_ns, cached.size = st.st_mtime_ns, st.st_size
+                stats.reused += 1
+                stats.rehashed += 1
+                continue
+            header, _, _ = split_frontmatter(data.decode("utf-8"))
+            self.entries[rel] = Entry(
+                path=rel,
+                mtime_ns=st.st_mtime_ns,
+                size=st.st_size,
+                digest=digest,
+                meta=parse_frontmatter(header),
+            )
+            self.changed.add(rel)
+            stats.parsed += 1
+        for rel in set(self.entries) - seen:
+            del self.entries[rel]
+            self.changed.add(rel)
+            stats.removed += 1
+        stats.total = len(self.entries)
+        stats.elapsed = time.perf_counter() - started
+        self.stats = stats
+        return stats
+
+    def ordered(self) -> list[Entry]:
+        """Entries that carry an ``order`` key, in reading order."""
+        return sorted(
+            (entry for entry in self.entries.values() if entry.order),
+            key=lambda entry: (entry.order, entry.path),
+        )
+
+
+def load_index(root: Path) -> FrontmatterIndex:
+    """Load, refresh, and (when anything changed) persist the index."""
+    index = FrontmatterIndex.load(root)
+    stats = index.refresh()
+    if stats.parsed or stats.removed or stats.rehashed:
+        index.save()
+    return index
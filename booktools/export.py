@@ -0,0 +1,285 @@
+"""Single-document export of the book as one HTML page or an EPUB.
+
+Reading order comes from the frontmatter index (``order`` keys), and link
+targets come from the link checker's slug cache, so planning an export never
+reads a document body.  Entries are then rendered in a process pool and
+written out strictly in order as they arrive.  At most ``WINDOW_PER_JOB``
+rendered entries per worker are in flight, so peak memory depends on the
+largest entry, not on the size of the book.
+
+Cross-file ``.md`` links and ``#anchors`` are rewritten to anchors inside the
+export: ``#<entry id>--<slug>`` in HTML and ``<entry id>.xhtml#...`` in EPUB.
+Unknown fragments fall back to the top of the target entry.  Links to files
+outside the export are re-based onto the output file's directory, so they
+still reach the source file from wherever the export is written, and get
+``class="outside-export"``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import os
+import posixpath
+import re
+import sys
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator
+
+from booktools import markdown
+from booktools.corpus import knowledge_base_root, load_index, split_frontmatter
+from booktools.links import LinkChecker
+from booktools.site import DEFAULT_OUTPUT, STYLESHEET, resolve_target
+
+BOOK_TITLE = "Agentic Engineering"
+BASENAME = "agentic-engineering"
+PARALLEL_THRESHOLD = 8
+WINDOW_PER_JOB = 2
+_VOID_RE = re.compile(r"<(br|hr|img|input)\b([^>]*?)\s*/?>")
+_BARE_ATTR_RE = re.compile(r" (checked|disabled)(?=[ /]|$)")
+
+
+def _xhtml_void(match: re.Match[str]) -> str:
+    """Self-close a void element and expand bare boolean attributes."""
+    attrs = _BARE_ATTR_RE.sub(r' \1="\1"', match.group(2))
+    return f"<{match.group(1)}{attrs} />"
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+{style}.entry{{border-top:1px solid #d0d7de;margin-top:3rem}}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{contents}
+"""
+
+XHTML_PAGE = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="en" xml:lang="en">
+<head>
+<meta charset="utf-8" />
+<title>{title}</title>
+<link rel="stylesheet" type="text/css" href="style.css" />
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+CONTAINER_XML = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles>
+<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+</rootfiles>
+</container>
+"""
+
+CONTENT_OPF = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="en">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>
+<dc:title>{title}</dc:title>
+<dc:language>en</dc:language>
+<meta property="dcterms:modified">{modified}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="style" href="style.css" media-type="text/css"/>
+{items}
+</manifest>
+<spine>
+{itemrefs}
+</spine>
+</package>
+"""
+
+
+def entry_id(path: str) -> str:
+    """Stable anchor/file id for a source path."""
+    return "doc-" + markdown.slugify(path[:-3].replace("/", "-").replace("_", ""))
+
+
+def plan(root: Path) -> tuple[list[str], dict[str, dict[str, Any]]]:
+    """Reading order and link targets, from the frontmatter and link caches."""
+    entries = load_index(root).ordered()
+    checker = LinkChecker(root)
+    checker.refresh()
+    targets = {
+        entry.path: {
+            "id": entry_id(entry.path),
+            "title": entry.title,
+            "depth": 0 if entry.path.endswith("/_index.md") else 1,
+            "slugs": checker.files.get(entry.path, {}).get("slugs", []),
+        }
+        for entry in entries
+    }
+    return [entry.path for entry in entries], targets
+
+
+def render_entry(job: tuple[str, str, str, dict[str, dict[str, Any]], str]) -> tuple[str, str, float]:
+    """Process-pool worker: render one entry as an export fragment.
+
+    ``base`` is the knowledge-base root relative to the output file's
+    directory, used for links that leave the export.
+    """
+    root, path, fmt, targets, base = job
+    started = time.perf_counter()
+    text = (Path(root) / path).read_text("utf-8")
+    _, body, first_line = split_frontmatter(text)
+    own = targets[path]["id"]
+
+    def link_hook(href: str) -> tuple[str, dict[str, str]]:
+        resolved = resolve_target(path, href)
+        if resolved is None:
+            return href, {}
+        target, fragment = resolved
+        info = targets.get(target)
+        if info is None:
+            outside = posixpath.join(base, target) + (f"#{fragment}" if fragment else "")
+            return outside, {"class": "outside-export"}
+        fragment = fragment.lower()
+        anchor = f"{info['id']}--{fragment}" if fragment in info["slugs"] else info["id"]
+        document = f"{info['id']}.xhtml" if fmt == "epub" and target != path else ""
+        return f"{document}#{anchor}", {}
+
+    rendered = markdown.render(body, link_hook=link_hook, id_prefix=f"{own}--", first_line=first_line)
+    fragment = f'<section class="entry" id="{own}">\n{rendered.html}</section>\n'
+    if fmt == "epub":
+        fragment = _VOID_RE.sub(_xhtml_void, fragment)
+    return path, fragment, time.perf_counter() - started
+
+
+def render_in_order(
+    root: Path, order: list[str], targets: dict[str, dict[str, Any]], fmt: str, jobs: int, output: Path
+) -> Iterator[tuple[str, str, float]]:
+    """Yield rendered entries in reading order while later ones render."""
+    base = Path(os.path.relpath(root.resolve(), output.resolve().parent)).as_posix()
+    work = iter([(str(root), path, fmt, targets, base) for path in order])
+    if jobs <= 1 or len(order) < PARALLEL_THRESHOLD:
+        yield from map(render_entry, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque(pool.submit(render_entry, job) for job in islice(work, jobs * WINDOW_PER_JOB))
+        while pending:
+            result = pending.popleft().result()
+            job = next(work, None)
+            if job is not None:
+                pending.append(pool.submit(render_entry, job))
+            yield result
+
+
+def _contents(order: list[str], targets: dict[str, dict[str, Any]], fmt: str) -> str:
+    items = []
+    for path in order:
+        info = targets[path]
+        href = f"{info['id']}.xhtml" if fmt == "epub" else f"#{info['id']}"
+        items.append(
+            f'<li class="depth-{info["depth"]}"><a href="{href}">{html.escape(info["title"])}</a></li>'
+        )
+    role = ' epub:type="toc"' if fmt == "epub" else ""
+    return f'<nav id="contents"{role}>\n<ol>\n' + "\n".join(items) + "\n</ol>\n</nav>\n"
+
+
+def write_html(output: Path, root: Path, order: list[str], targets: dict[str, dict[str, Any]], jobs: int) -> int:
+    tmp = output.with_name(output.name + ".tmp")
+    written = 0
+    with open(tmp, "w", encoding="utf-8") as handle:
+        handle.write(
+            HTML_HEAD.format(
+                title=html.escape(BOOK_TITLE), style=STYLESHEET, contents=_contents(order, targets, "html")
+            )
+        )
+        for _, fragment, _ in render_in_order(root, order, targets, "html", jobs, output):
+            handle.write(fragment)
+            written += 1
+        handle.write("</body>\n</html>\n")
+    os.replace(tmp, output)
+    return written
+
+
+def write_epub(output: Path, root: Path, order: list[str], targets: dict[str, dict[str, Any]], jobs: int) -> int:
+    corpus = load_index(root)
+    identifier = uuid.uuid5(uuid.NAMESPACE_URL, "|".join(corpus.entries[p].digest for p in order))
+    tmp = output.with_name(output.name + ".tmp")
+    written = 0
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as book:
+        # The mimetype entry must come first and be stored uncompressed.
+        book.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", zipfile.ZIP_STORED)
+        book.writestr("META-INF/container.xml", CONTAINER_XML)
+        book.writestr("OEBPS/style.css", STYLESHEET)
+        for path, fragment, _ in render_in_order(root, order, targets, "epub", jobs, output):
+            info = targets[path]
+            book.writestr(
+                f"OEBPS/{info['id']}.xhtml",
+                XHTML_PAGE.format(title=html.escape(info["title"]), body=fragment),
+            )
+            written += 1
+        book.writestr(
+            "OEBPS/nav.xhtml",
+            XHTML_PAGE.format(title=html.escape(BOOK_TITLE), body=_contents(order, targets, "epub")),
+        )
+        book.writestr(
+            "OEBPS/content.opf",
+            CONTENT_OPF.format(
+                identifier=identifier,
+                title=html.escape(BOOK_TITLE),
+                modified=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                items="\n".join(
+                    f'<item id="{targets[p]["id"]}" href="{targets[p]["id"]}.xhtml" '
+                    'media-type="application/xhtml+xml"/>'
+                    for p in order
+                ),
+                itemrefs="\n".join(f'<itemref idref="{targets[p]["id"]}"/>' for p in order),
+            ),
+        )
+    os.replace(tmp, output)
+    return written
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    fmt = args.format or (Path(args.output).suffix.lstrip(".") if args.output else "html")
+    if fmt not in ("html", "epub"):
+        print(f"export: unknown format {fmt!r} (use html or epub)", file=sys.stderr)
+        return 2
+    if args.output:
+        output = Path(args.output)
+    else:
+        output = root / DEFAULT_OUTPUT / f"{BASENAME}.{fmt}"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    order, targets = plan(root)
+    jobs = args.jobs or os.cpu_count() or 1
+    writer = write_epub if fmt == "epub" else write_html
+    written = writer(output, root, order, targets, jobs)
+    print(
+        f"export: {written} entries -> {output} ({output.stat().st_size // 1024} KiB) "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "export", help="export the whole book as one HTML page or an EPUB"
+    )
+    parser.add_argument("-f", "--format", choices=("html", "epub"), help="output format (default: from -o, else html)")
+    parser.add_argument(
+        "-o", "--output", help=f"output file (default: {DEFAULT_OUTPUT}/{BASENAME}.<format>)"
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="render processes (default: CPU count)")
+    parser.set_defaults(func=run)
@@ -0,0 +1,264 @@
+"""Cross-reference and anchor validation for internal markdown links.
+
+Each document is streamed once to collect both its heading slugs and its
+outgoing links; the results are cached per file in ``.booktools/links.json``
+and only re-scanned when a file's stat (then content hash) changes.  Large
+re-scans fan out across a process pool.
+
+Checking is a pure in-memory lookup against the slug index.  In incremental
+mode (``--changed`` or explicit paths) only links *out of* changed files and
+links *into* changed or deleted files are re-checked, which is what a
+pre-commit gate on a single agent edit needs.  ``--changed`` asks git which
+files differ from a revision (``HEAD`` by default), never the cache, so
+re-running a failing gate re-checks the same files.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import posixpath
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote
+
+from booktools import markdown
+from booktools.corpus import (
+    CACHE_DIR,
+    cache_dir,
+    content_hash,
+    knowledge_base_root,
+    relative_paths,
+    scan_documents,
+    split_frontmatter,
+)
+
+CACHE_FILE = "links.json"
+CACHE_VERSION = 1
+PARALLEL_THRESHOLD = 64
+_SCHEMES = ("http:", "https:", "mailto:", "tel:", "ftp:", "data:")
+
+
+@dataclass(frozen=True)
+class Problem:
+    path: str
+    line: int
+    href: str
+    reason: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}: {self.reason}: {self.href}"
+
+
+def scan_file(job: tuple[str, str]) -> tuple[str, str, list[str], list[list[Any]]]:
+    """Process-pool worker: ``(root, path)`` -> digest, slugs, links."""
+    root, rel = job
+    data = (Path(root) / rel).read_bytes()
+    text = data.decode("utf-8")
+    _, body, first_line = split_frontmatter(text)
+    headings, links = markdown.scan(body.splitlines(), first_line)
+    return (
+        rel,
+        content_hash(data),
+        [h.slug for h in headings],
+        [[link.line, link.href] for link in links],
+    )
+
+
+def resolve(source: str, href: str) -> tuple[str | None, str]:
+    """Resolve ``href`` from ``source`` to ``(root-relative path, fragment)``.
+
+    Returns ``(None, "")`` for external links, which are not checked.
+    """
+    if href.lower().startswith(_SCHEMES) or "://" in href:
+        return None, ""
+    target, _, fragment = href.partition("#")
+    target = unquote(target.split("?", 1)[0])
+    if not target:
+        return source, fragment
+    if target.startswith("/"):
+        resolved = posixpath.normpath(target.lstrip("/"))
+    else:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+    return resolved, fragment
+
+
+class LinkChecker:
+    def __init__(self, root: Path, jobs: int | None = None):
+        self.root = root
+        self.jobs = jobs or os.cpu_count() or 1
+        self.files: dict[str, dict[str, Any]] = {}
+        self._exists: dict[str, bool] = {}
+
+    @property
+    def cache_path(self) -> Path:
+        return self.root / CACHE_DIR / CACHE_FILE
+
+    def refresh(self) -> int:
+        """Update the slug/link index; returns how many files were re-scanned."""
+        try:
+            data = json.loads(self.cache_path.read_text("utf-8"))
+            previous = data["files"] if data.get("version") == CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            previous = {}
+        stats: dict[str, os.stat_result] = {}
+        todo = []
+        for rel, st in scan_documents(self.root):
+            stats[rel] = st
+            cached = previous.get(rel)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                self.files[rel] = cached
+            else:
+                todo.append(rel)
+        jobs = [(str(self.root), rel) for rel in todo]
+        if len(jobs) >= PARALLEL_THRESHOLD and self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(scan_file, jobs, chunksize=16))
+        else:
+            results = [scan_file(job) for job in jobs]
+        for rel, digest, slugs, links in results:
+            self.files[rel] = {
+                "mtime_ns": stats[rel].st_mtime_ns,
+                "size": stats[rel].st_size,
+                "digest": digest,
+                "slugs": slugs,
+                "links": links,
+            }
+        if todo or set(previous) != set(self.files):
+            cache_dir(self.root)
+            tmp = self.cache_path.with_suffix(".tmp")
+            tmp.write_text(
+                json.dumps({"version": CACHE_VERSION, "files": self.files}, separators=(",", ":")),
+                "utf-8",
+            )
+            os.replace(tmp, self.cache_path)
+        return len(todo)
+
+    def _exists_on_disk(self, rel: str) -> bool:
+        if rel not in self._exists:
+            self._exists[rel] = (self.root / rel).exists()
+        return self._exists[rel]
+
+    def check_link(self, source: str, href: str) -> str | None:
+        """Return why ``href`` in ``source`` is broken, or ``None``."""
+        if not href:
+            return "empty link"
+        target, fragment = resolve(source, href)
+        if target is None:
+            return None
+        if target == ".." or target.startswith("../"):
+            return "link leaves the knowledge base"
+        info = self.files.get(target)
+        if info is None:
+            if not self._exists_on_disk(target):
+                return "missing target"
+            return None
+        if fragment and fragment.lower() not in info["slugs"]:
+            return f"unknown anchor #{fragment}"
+        return None
+
+    def check(self, scope: set[str] | None = None) -> tuple[list[Problem], int]:
+        """Check every link, or only links touching ``scope`` when given.
+
+        Returns the problems and the number of links examined.
+        """
+        problems = []
+        checked = 0
+        for source in sorted(self.files):
+            outgoing = scope is None or source in scope
+            for line, href in self.files[source]["links"]:
+                if not outgoing:
+                    target, _ = resolve(source, href)
+                    if target not in scope:
+                        continue
+                checked += 1
+                reason = self.check_link(source, href)
+                if reason:
+                    problems.append(Problem(source, line, href, reason))
+        return problems, checked
+
+
+def changed_files(root: Path, since: str = "HEAD") -> set[str]:
+    """Paths under ``root`` that differ from ``since``, including untracked
+    and deleted files; renames count as a deletion plus an addition.
+
+    Raises :class:`RuntimeError` when ``root`` is not inside a git checkout.
+    """
+    commands = (
+        ["git", "diff", "--name-only", "--no-renames", "--relative", "-z", since, "--"],
+        ["git", "ls-files", "--others", "--exclude-standard", "-z"],
+    )
+    changed: set[str] = set()
+    for command in commands:
+        proc = subprocess.run(command, cwd=root, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip() or f"{' '.join(command)} failed")
+        changed.update(path for path in proc.stdout.split("\0") if path)
+    return changed
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    checker = LinkChecker(root, jobs=args.jobs)
+    scanned = checker.refresh()
+    scope: set[str] | None = None
+    if args.paths:
+        paths = relative_paths(root, args.paths, "links")
+        if paths is None:
+            return 2
+        scope = set(paths)
+    elif args.changed:
+        try:
+            scope = changed_files(root, args.since)
+        except RuntimeError as exc:
+            print(f"links: --changed needs git: {exc}", file=sys.stderr)
+            return 2
+    problems, checked = checker.check(scope)
+    elapsed = time.perf_counter() - started
+    if args.json:
+        json.dump(
+            {
+                "files": len(checker.files),
+                "scanned": scanned,
+                "checked": checked,
+                "elapsed_ms": round(elapsed * 1000, 2),
+                "problems": [asdict(p) for p in problems],
+            },
+            sys.stdout,
+            indent=2,
+        )
+        sys.stdout.write("\n")
+    else:
+        for problem in problems:
+            print(problem)
+    print(
+        f"links: {checked} links in {len(checker.files)} files checked "
+        f"({scanned} re-scanned), {len(problems)} broken, in {elapsed * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 1 if problems else 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser("links", help="validate internal links and #anchors")
+    parser.add_argument(
+        "paths", nargs="*", help="only check links into or out of these files"
+    )
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="only check links touching files that differ from --since (uncommitted edits)",
+    )
+    parser.add_argument(
+        "--since", default="HEAD", metavar="REV", help="git revision --changed compares against"
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="scan processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="emit a JSON report")
+    parser.set_defaults(func=run)
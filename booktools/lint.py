@@ -0,0 +1,500 @@
+"""Single-pass STYLE_GUIDE.md linter with a per-file result cache.
+
+Each file is tokenised exactly once into a stream of prose tokens (fenced
+code skipped, inline code and link targets blanked) and every rule sees that
+same stream through three hooks: ``frontmatter``, ``token``, and ``finish``.
+Adding a rule therefore costs one more method call per token, not another
+sweep over the corpus.
+
+Results are cached in ``.booktools/lint.json`` keyed by content hash and the
+rule-set version, so re-linting an agent's revision only evaluates the files
+it actually changed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from booktools import markdown
+from booktools.corpus import (
+    cache_dir,
+    content_hash,
+    knowledge_base_root,
+    parse_frontmatter,
+    relative_paths,
+    scan_sources,
+    split_frontmatter,
+    stat_paths,
+)
+
+RULESET_VERSION = "2"
+CACHE_FILE = "lint.json"
+PARALLEL_THRESHOLD = 32
+
+REQUIRED_FRONTMATTER = (
+    "title",
+    "description",
+    "created",
+    "last_updated",
+    "tags",
+    "part",
+    "chapter",
+    "section",
+    "order",
+)
+
+_INLINE_CODE_RE = re.compile(r"(`+).+?\1")
+_LINK_TARGET_RE = re.compile(r"\]\([^)]*\)")
+_URL_RE = re.compile(r"<?https?://\S+")
+_QUOTED_RE = re.compile(r"\"[^\"]*\"|“[^”]*”")
+_HTML_COMMENT_RE = re.compile(r"<!--.*?-->")
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ORDER_RE = re.compile(r"\d+(\.\d+)*")
+_WORD_RE = re.compile(r"[A-Za-z]+(?:['’][a-z]+)?")
+_CAPS_RE = re.compile(r"[A-Z][A-Z0-9]")
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    rule: str
+    severity: str
+    line: int
+    message: str
+    subject: str = ""
+
+
+@dataclass(frozen=True)
+class Token:
+    """One prose line, pre-cleaned once for every rule.
+
+    ``kind`` is ``heading``, ``quote`` (blockquote), ``table``, or ``text``.
+    ``text`` has inline code, link targets, URLs, and HTML comments blanked;
+    ``plain`` additionally has quoted speech removed, and ``words`` is
+    ``plain`` split into words so word-list rules need no regex of their own.
+    """
+
+    line: int
+    kind: str
+    text: str
+    plain: str
+    words: frozenset[str]
+    level: int = 0
+
+
+def tokenize(lines: list[str], first_line: int) -> Iterator[Token]:
+    for number, raw in markdown.iter_prose(lines, first_line):
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        text = raw
+        if "<!--" in text:
+            text = _HTML_COMMENT_RE.sub(" ", text)
+        if "`" in text:
+            text = _INLINE_CODE_RE.sub(" ", text)
+        if "](" in text:
+            text = _LINK_TARGET_RE.sub("]", text)
+        if "://" in text:
+            text = _URL_RE.sub(" ", text)
+        level = 0
+        if stripped.startswith("#") and (match := re.match(r"(#{1,6})\s", stripped)):
+            kind, level = "heading", len(match.group(1))
+        elif stripped.startswith(">"):
+            kind = "quote"
+        elif stripped.startswith("|"):
+            kind = "table"
+        else:
+            kind = "text"
+        plain = _QUOTED_RE.sub(" ", text) if '"' in text or "“" in text else text
+        yield Token(number, kind, text, plain, frozenset(_WORD_RE.findall(plain)), level)
+
+
+# ---------------------------------------------------------------------------
+# Rules
+# ---------------------------------------------------------------------------
+
+
+class Rule:
+    id = ""
+    severity = "warning"
+
+    def __init__(self) -> None:
+        self.found: list[Diagnostic] = []
+
+    def report(self, line: int, message: str, subject: str = "") -> None:
+        self.found.append(Diagnostic(self.id, self.severity, line, message, subject))
+
+    def frontmatter(self, meta: dict[str, Any], path: str) -> None:
+        pass
+
+    def token(self, token: Token) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+class ThirdPersonVoice(Rule):
+    """No first- or second-person pronouns outside quotations."""
+
+    id = "third-person"
+    _BASE = """I I'm I've I'd we we're we've our ours us my me you you're you've you'll
+        your yours""".split()
+    PRONOUNS = frozenset(
+        variant
+        for word in _BASE
+        for cased in (word, word[:1].upper() + word[1:])
+        for variant in (cased, cased.replace("'", "’"))
+    )
+
+    def token(self, token: Token) -> None:
+        if token.kind == "quote":
+            return
+        found = self.PRONOUNS.intersection(token.words)
+        if found:
+            self.report(token.line, f"first/second-person pronoun {min(found)!r}")
+
+
+class NoHedging(Rule):
+    """Weak qualifiers the style guide lists under "Avoid Hedging"."""
+
+    id = "no-hedging"
+    WORDS = frozenset(
+        "perhaps Perhaps possibly Possibly arguably Arguably somewhat basically Basically".split()
+    )
+    PHRASES = (
+        "it seems",
+        "seems like",
+        "might be worth",
+        "sort of",
+        "kind of",
+        "it can be argued",
+        "it could be argued",
+        "to some extent",
+    )
+
+    def token(self, token: Token) -> None:
+        if token.kind in ("quote", "heading"):
+            return
+        found = self.WORDS.intersection(token.words)
+        if found:
+            self.report(token.line, f"hedging word {min(found).lower()!r}")
+            return
+        lowered = token.plain.lower()
+        for phrase in self.PHRASES:
+            if phrase in lowered:
+                self.report(token.line, f"hedging phrase {phrase!r}")
+                return
+
+
+class ConnectionsSection(Rule):
+    """Every entry carries a ``## Connections`` section with at least one link."""
+
+    id = "connections-section"
+    severity = "error"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.heading_line = 0
+        self.links = 0
+        self.inside = False
+
+    def token(self, token: Token) -> None:
+        if token.kind == "heading" and token.level <= 2:
+            self.inside = token.level == 2 and token.text.strip("# ").strip() == "Connections"
+            if self.inside:
+                self.heading_line = token.line
+        elif self.inside and "]" in token.text:
+            self.links += 1
+
+    def finish(self) -> None:
+        if not self.heading_line:
+            self.report(1, "missing '## Connections' section")
+        elif not self.links:
+            self.report(self.heading_line, "'## Connections' section has no links")
+
+
+class DefineOnFirstUse(Rule):
+    """Acronyms must be expanded where they first appear.
+
+    An acronym counts as defined when its first prose occurrence sits in
+    parentheses after an expansion (``retrieval-augmented generation (RAG)``)
+    or is immediately followed by one (``RAG (retrieval-augmented ...)`` or
+    ``RAG—...``).  Ubiquitous computing acronyms are exempt.  Capitalised
+    emphasis (``NEVER``, ``DO NOT UPDATE``) is not an acronym: a word is
+    skipped when it is an English function word, when the entry uses it in
+    lower case, or when it sits in a run of capitals containing such a word.
+    :func:`lint_tree` widens "uses it in lower case" to the whole corpus.
+    """
+
+    id = "define-on-first-use"
+    _ACRONYM_RE = re.compile(r"(?<![\w./-])([A-Z][A-Z0-9]{1,5})s?(?![\w/-]|\.\w)")
+    _RUN_RE = re.compile(r"\b[A-Z][A-Z']+(?:[ ,]+[A-Z][A-Z']+)+\b")
+    EXEMPT = frozenset(
+        """AI API CLI JSON YAML HTML CSS URL URI HTTP HTTPS SDK CPU GPU UI UX IDE PR PRS CI
+        CD OK ID IDS LLM LLMS SQL CSV XML PDF TODO README OS RAM USD US UK EU FAQ TL DR
+        AWS GCP SSH SSD GB MB KB TB MS NPM GIT PM AM Q1 Q2 Q3 Q4 V1 V2 V3 V4 TOC""".split()
+    )
+    FUNCTION_WORDS = frozenset(
+        """a an the and or nor but if so as at by for from in into of off on onto out over to
+        up with without about after before under than then when where while why what which
+        who how all any each every no not none some only both either neither this that these
+        those i me my we us our you your he him his she her it its they them their is am are
+        was were be been do does did done don can could may might must shall should will would
+        yes ok also very just more most less least here there now never always again""".split()
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.seen: set[str] = set()
+        self.vocabulary: set[str] = set()
+        self.pending: list[tuple[int, str, list[str]]] = []
+
+    def token(self, token: Token) -> None:
+        self.vocabulary.update(w.lower() for w in token.words if not w.isupper())
+        if token.kind == "heading" or token.kind == "quote":
+            return
+        if not _CAPS_RE.search(token.text):
+            return
+        text = token.text
+        runs = [(m.start(), m.end(), m.group().replace(",", " ").split()) for m in self._RUN_RE.finditer(text)]
+        for match in self._ACRONYM_RE.finditer(text):
+            acronym = match.group(1)
+            if acronym in self.seen or acronym in self.EXEMPT:
+                continue
+            self.seen.add(acronym)
+            before = text[: match.start()].rstrip()
+            after = text[match.end() :].lstrip()
+            if before.endswith("(") or after.startswith(("(", "—", "--", ":")):
+                continue
+            if f"({acronym})" in text or f"({acronym}s)" in text:
+                continue
+            run = next((words for a, b, words in runs if a <= match.start() < b), [acronym])
+            self.pending.append((token.line, acronym, run))
+
+    def _ordinary(self, word: str) -> bool:
+        word = word.lower()
+        return word in self.FUNCTION_WORDS or word in self.vocabulary
+
+    def finish(self) -> None:
+        for line, acronym, run in self.pending:
+            if not any(self._ordinary(word) for word in run):
+                self.report(line, f"acronym {acronym!r} used before it is defined", acronym)
+
+
+class FrontmatterChecklist(Rule):
+    """The frontmatter checklist at the end of STYLE_GUIDE.md."""
+
+    id = "frontmatter"
+    severity = "error"
+
+    def frontmatter(self, meta: dict[str, Any], path: str) -> None:
+        for key in REQUIRED_FRONTMATTER:
+            if meta.get(key) in (None, "", []):
+                self.report(1, f"frontmatter is missing '{key}'")
+        for key in ("created", "last_updated"):
+            value = str(meta.get(key, ""))
+            if value and not _DATE_RE.fullmatch(value):
+                self.report(1, f"'{key}' must be YYYY-MM-DD, got {value!r}")
+        created, updated = str(meta.get("created", "")), str(meta.get("last_updated", ""))
+        if _DATE_RE.fullmatch(created) and _DATE_RE.fullmatch(updated):
+            try:
+                if dt.date.fromisoformat(updated) < dt.date.fromisoformat(created):
+                    self.report(1, "'last_updated' is earlier than 'created'")
+            except ValueError as exc:
+                self.report(1, f"invalid date: {exc}")
+        if "tags" in meta and not isinstance(meta["tags"], list):
+            self.report(1, "'tags' must be a list")
+        order = str(meta.get("order", ""))
+        if order and not _ORDER_RE.fullmatch(order):
+            self.report(1, f"'order' must look like 1.2.3, got {order!r}")
+        elif order and all(isinstance(meta.get(k), int) for k in ("part", "chapter", "section")):
+            expected = f"{meta['part']}.{meta['chapter']}.{meta['section']}"
+            if order != expected:
+                self.report(1, f"'order' {order} disagrees with part.chapter.section {expected}")
+
+
+RULES: tuple[type[Rule], ...] = (
+    ThirdPersonVoice,
+    NoHedging,
+    ConnectionsSection,
+    DefineOnFirstUse,
+    FrontmatterChecklist,
+)
+
+
+def lint_text(text: str, path: str = "<text>") -> list[Diagnostic]:
+    """Run every rule over ``text`` in one tokenising pass."""
+    return _lint(text, path)[0]
+
+
+def _lint(text: str, path: str) -> tuple[list[Diagnostic], set[str]]:
+    """Diagnostics plus the words the entry uses in lower case."""
+    header, body, first_line = split_frontmatter(text)
+    rules = [rule() for rule in RULES]
+    meta = parse_frontmatter(header)
+    for rule in rules:
+        rule.frontmatter(meta, path)
+    hooks = [rule.token for rule in rules]
+    for token in tokenize(body.splitlines(), first_line):
+        for hook in hooks:
+            hook(token)
+    found = []
+    for rule in rules:
+        rule.finish()
+        found.extend(rule.found)
+    found.sort(key=lambda d: (d.line, d.rule))
+    vocabulary = next(r.vocabulary for r in rules if isinstance(r, DefineOnFirstUse))
+    return found, vocabulary
+
+
+def lint_file(job: tuple[str, str]) -> tuple[str, str, list[dict[str, Any]], list[str]]:
+    """Process-pool worker: ``(root, path)`` -> digest, diagnostics, vocabulary."""
+    root, rel = job
+    data = (Path(root) / rel).read_bytes()
+    diagnostics, vocabulary = _lint(data.decode("utf-8"), rel)
+    return rel, content_hash(data), [asdict(d) for d in diagnostics], sorted(vocabulary)
+
+
+# ---------------------------------------------------------------------------
+# Command
+# ---------------------------------------------------------------------------
+
+
+def lint_tree(
+    root: Path, paths: list[str] | None = None, jobs: int | None = None
+) -> tuple[dict[str, list[dict[str, Any]]], int]:
+    """Lint ``paths`` (default: every source); returns results and how many were re-linted."""
+    cache_path = cache_dir(root) / CACHE_FILE
+    try:
+        data = json.loads(cache_path.read_text("utf-8"))
+        cache = data["files"] if data.get("version") == RULESET_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        cache = {}
+    sources = scan_sources(root)
+    targets = stat_paths(root, paths)[0] if paths else sources
+    wanted = {rel for rel, _ in targets}
+    # Every source feeds the corpus vocabulary, so stale sources are linted
+    # even when only explicit paths were asked for, and deleted ones dropped.
+    stats = dict(sources)
+    stats.update(targets)
+    pruned = set(cache) - set(stats)
+    for rel in pruned:
+        del cache[rel]
+    results: dict[str, list[dict[str, Any]]] = {}
+    todo = []
+    touched = False
+    for rel, st in stats.items():
+        cached = cache.get(rel)
+        if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+            pass
+        elif cached and cached["digest"] == content_hash((root / rel).read_bytes()):
+            cached["mtime_ns"], cached["size"] = st.st_mtime_ns, st.st_size
+            touched = True
+        else:
+            todo.append((str(root), rel))
+            continue
+        if rel in wanted:
+            results[rel] = cached["diagnostics"]
+    workers = jobs or os.cpu_count() or 1
+    if len(todo) >= PARALLEL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            linted = list(pool.map(lint_file, todo, chunksize=4))
+    else:
+        linted = [lint_file(job) for job in todo]
+    for rel, digest, diagnostics, vocabulary in linted:
+        if rel in wanted:
+            results[rel] = diagnostics
+        cache[rel] = {
+            "mtime_ns": stats[rel].st_mtime_ns,
+            "size": stats[rel].st_size,
+            "digest": digest,
+            "diagnostics": diagnostics,
+            "vocabulary": vocabulary,
+        }
+    if todo or touched or pruned:
+        tmp = cache_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": RULESET_VERSION, "files": cache}, separators=(",", ":")),
+            "utf-8",
+        )
+        os.replace(tmp, cache_path)
+    # An all-caps word the book also writes in lower case is emphasis.
+    vocabulary = {word for rel, _ in sources for word in cache[rel]["vocabulary"]}
+    for rel, found in results.items():
+        results[rel] = [
+            d for d in found if d["rule"] != DefineOnFirstUse.id or d["subject"].lower() not in vocabulary
+        ]
+    return dict(sorted(results.items())), sum(rel in wanted for _, rel in todo)
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    paths = relative_paths(root, args.paths, "lint")
+    if paths is None:
+        return 2
+    if paths:
+        found, missing = stat_paths(root, paths)
+        for rel in missing:
+            print(f"lint: skipping {rel}: no such file", file=sys.stderr)
+        paths = [rel for rel, _ in found]
+        if not paths:
+            return 0
+    results, evaluated = lint_tree(root, paths or None, args.jobs)
+    selected = set(args.rule or ())
+    counts = {"error": 0, "warning": 0}
+    for rel in results:
+        results[rel] = [d for d in results[rel] if not selected or d["rule"] in selected]
+        for diagnostic in results[rel]:
+            counts[diagnostic["severity"]] += 1
+    elapsed = time.perf_counter() - started
+    if args.json:
+        json.dump(
+            {
+                "files": len(results),
+                "evaluated": evaluated,
+                "elapsed_ms": round(elapsed * 1000, 2),
+                "counts": counts,
+                "diagnostics": [
+                    {"path": rel, **d} for rel, found in results.items() for d in found
+                ],
+            },
+            sys.stdout,
+            separators=(",", ":"),
+        )
+        sys.stdout.write("\n")
+    else:
+        for rel, found in results.items():
+            for d in found:
+                print(f"{rel}:{d['line']}: {d['severity']}: [{d['rule']}] {d['message']}")
+    print(
+        f"lint: {len(results)} files ({evaluated} evaluated, "
+        f"{len(results) - evaluated} cached), {counts['error']} errors, "
+        f"{counts['warning']} warnings, in {elapsed * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 1 if counts["error"] else 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser("lint", help="check entries against STYLE_GUIDE.md")
+    parser.add_argument("paths", nargs="*", help="files to lint (default: every entry)")
+    parser.add_argument(
+        "--rule",
+        action="append",
+        choices=[rule.id for rule in RULES],
+        help="only report this rule (repeatable)",
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="lint processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="emit one compact JSON report")
+    parser.set_defaults(func=run)
@@ -0,0 +1,536 @@
+"""Fence-aware markdown scanning and a small dependency-free HTML renderer.
+
+The scanner (:func:`scan`) walks a document once, collecting headings and
+links while ignoring fenced code, which is where most false positives in a
+technical book come from.  The renderer covers the markdown the book actually uses:
+ATX headings, paragraphs, nested lists, blockquotes (including GitHub alert
+callouts), pipe tables, fenced code, thematic breaks, and the usual inline
+spans.  Heading ids follow GitHub's slug rules so existing ``#anchor`` links
+keep working in rendered output.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+LinkHook = Callable[[str], "tuple[str, dict[str, str]]"]
+
+_FENCE_RE = re.compile(r"^( {0,3})(`{3,}|~{3,})(.*)$")
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_HR_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_LIST_RE = re.compile(r"^( *)([-*+]|\d{1,9}[.)])( +|$)(.*)$")
+_TABLE_SEP_RE = re.compile(r"^ *\|? *:?-+:? *(\| *:?-+:? *)*\|? *$")
+_ALERT_RE = re.compile(r"^\[!(NOTE|TIP|IMPORTANT|WARNING|CAUTION)\]\s*$", re.I)
+_SLUG_DROP_RE = re.compile(r"[^\w\- ]", re.UNICODE)
+_CODE_SPAN_RE = re.compile(r"(`+)(.+?)\1", re.S)
+_LINK_RE = re.compile(
+    r"(!?)\[((?:[^\[\]]|\[[^\[\]]*\])*)\]\(\s*<?([^)\s>]*)>?(?:\s+\"([^\"]*)\")?\s*\)"
+)
+_AUTOLINK_RE = re.compile(r"<(https?://[^>\s]+)>")
+_STRONG_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1", re.S)
+_EM_RE = re.compile(r"(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![\w*])|\b_(?=\S)(.+?)(?<=\S)_\b", re.S)
+_STRIKE_RE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~", re.S)
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# Headings of bibliography-style sections that carry no prose of their own.
+REFERENCE_HEADINGS = frozenset({"sources", "references", "further reading"})
+
+
+# ---------------------------------------------------------------------------
+# Slugs
+# ---------------------------------------------------------------------------
+
+
+def slugify(text: str) -> str:
+    """GitHub-compatible heading slug (without duplicate suffixes)."""
+    text = _CODE_SPAN_RE.sub(lambda m: m.group(2), text)
+    text = _LINK_RE.sub(lambda m: m.group(2), text)
+    text = _TAG_RE.sub("", text)
+    return _SLUG_DROP_RE.sub("", text.strip().lower()).replace(" ", "-")
+
+
+class Slugger:
+    """Assigns unique slugs within one document (``x``, ``x-1``, ``x-2`` ...)."""
+
+    def __init__(self) -> None:
+        self._seen: dict[str, int] = {}
+
+    def slug(self, text: str) -> str:
+        base = slugify(text)
+        count = self._seen.get(base)
+        if count is None:
+            self._seen[base] = 0
+            return base
+        while True:
+            count += 1
+            candidate = f"{base}-{count}"
+            if candidate not in self._seen:
+                self._seen[base] = count
+                self._seen[candidate] = 0
+                return candidate
+
+
+# ---------------------------------------------------------------------------
+# Scanners
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Heading:
+    line: int
+    level: int
+    text: str
+    slug: str
+
+
+@dataclass(frozen=True)
+class Link:
+    line: int
+    text: str
+    href: str
+
+
+@dataclass(frozen=True)
+class Fence:
+    """A fenced code block: opening line, info string, de-indented source."""
+
+    line: int
+    info: str
+    source: str
+    closed: bool = True
+
+    @property
+    def lang(self) -> str:
+        return self.info.split()[0].lower() if self.info else ""
+
+
+def _open_fence(line: str) -> re.Match[str] | None:
+    """Match an opening fence; a backtick fence's info string has no backticks."""
+    match = _FENCE_RE.match(line)
+    if match and not (match.group(2)[0] == "`" and "`" in match.group(3)):
+        return match
+    return None
+
+
+def _closes_fence(line: str, marker: str) -> bool:
+    match = _FENCE_RE.match(line)
+    return bool(
+        match
+        and match.group(2)[0] == marker[0]
+        and len(match.group(2)) >= len(marker)
+        and not match.group(3).strip()
+    )
+
+
+def _walk(lines: list[str], first_line: int) -> Iterator[tuple[int, str] | Fence]:
+    """Prose lines as ``(line_number, line)`` and each fenced block as a :class:`Fence`."""
+    fence: re.Match[str] | None = None
+    start = 0
+    body: list[str] = []
+    for number, line in enumerate(lines, first_line):
+        if fence is None:
+            fence = _open_fence(line)
+            if fence is None:
+                yield number, line
+            else:
+                start, body = number, []
+        elif _closes_fence(line, fence.group(2)):
+            yield Fence(start, fence.group(3).strip(), "\n".join(body) + "\n" if body else "")
+            fence = None
+        else:
+            indent = len(fence.group(1))
+            body.append(line[min(indent, len(line) - len(line.lstrip(" "))) :])
+    if fence is not None:
+        yield Fence(start, fence.group(3).strip(), "\n".join(body) + "\n" if body else "", False)
+
+
+def iter_prose(lines: list[str], first_line: int = 1) -> Iterator[tuple[int, str]]:
+    """Yield ``(line_number, line)`` for lines outside fenced code blocks."""
+    for item in _walk(lines, first_line):
+        if type(item) is tuple:
+            yield item
+
+
+def iter_fences(lines: list[str], first_line: int = 1) -> Iterator[Fence]:
+    """Yield every fenced code block; an unterminated one has ``closed=False``."""
+    for item in _walk(lines, first_line):
+        if type(item) is Fence:
+            yield item
+
+
+def scan(lines: list[str], first_line: int = 1) -> tuple[list[Heading], list[Link]]:
+    """Every ATX heading and inline link outside code fences, in one pass.
+
+    Headings get GitHub-style unique slugs; links inside code spans and
+    images are skipped.
+    """
+    slugger = Slugger()
+    headings: list[Heading] = []
+    links: list[Link] = []
+    for number, line in iter_prose(lines, first_line):
+        if line.startswith(("#", " ")):
+            match = _HEADING_RE.match(line)
+            if match:
+                text = (match.group(2) or "").strip()
+                headings.append(Heading(number, len(match.group(1)), text, slugger.slug(text)))
+        if "](" in line:
+            masked = _CODE_SPAN_RE.sub(lambda m: " " * len(m.group(0)), line)
+            for match in _LINK_RE.finditer(masked):
+                if not match.group(1):
+                    links.append(Link(number, match.group(2), match.group(3)))
+    return headings, links
+
+
+# ---------------------------------------------------------------------------
+# Renderer
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Rendered:
+    html: str
+    headings: list[Heading] = field(default_factory=list)
+
+
+class _Inline:
+    """Inline span renderer using placeholders so spans never re-escape."""
+
+    def __init__(self, link_hook: LinkHook | None):
+        self.link_hook = link_hook
+        self.stash: list[str] = []
+
+    def _keep(self, fragment: str) -> str:
+        self.stash.append(fragment)
+        return f"\x00{len(self.stash) - 1}\x00"
+
+    def _link(self, match: re.Match[str]) -> str:
+        image, text, href, title = match.groups()
+        attrs: dict[str, str] = {}
+        if not image and self.link_hook is not None:
+            href, attrs = self.link_hook(href)
+        if title:
+            attrs.setdefault("title", title)
+        extra = "".join(f' {k}="{html.escape(v)}"' for k, v in attrs.items())
+        if image:
+            return self._keep(
+                f'<img src="{html.escape(href)}" alt="{html.escape(text)}"{extra}>'
+            )
+        return self._keep(f'<a href="{html.escape(href)}"{extra}>{self.render(text)}</a>')
+
+    def render(self, text: str) -> str:
+        text = _CODE_SPAN_RE.sub(
+            lambda m: self._keep(f"<code>{html.escape(m.group(2).strip())}</code>"), text
+        )
+        text = _LINK_RE.sub(self._link, text)
+        text = _AUTOLINK_RE.sub(
+            lambda m: self._keep(
+                f'<a href="{html.escape(m.group(1))}">{html.escape(m.group(1))}</a>'
+            ),
+            text,
+        )
+        text = html.escape(text, quote=False)
+        text = _STRONG_RE.sub(r"<strong>\2</strong>", text)
+        text = _EM_RE.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+        text = _STRIKE_RE.sub(r"<del>\1</del>", text)
+        text = text.replace("  \n", "<br>\n")
+        while "\x00" in text:
+            text = _PLACEHOLDER_RE.sub(lambda m: self.stash[int(m.group(1))], text)
+        return text
+
+
+class _Blocks:
+    def __init__(self, inline: _Inline, slugger: Slugger, id_prefix: str):
+        self.inline = inline
+        self.slugger = slugger
+        self.id_prefix = id_prefix
+        self.headings: list[Heading] = []
+
+    def render(self, lines: list[str], tight: bool = False, offset: int = 1) -> str:
+        out: list[str] = []
+        para: list[str] = []
+        i = 0
+
+        def flush() -> None:
+            if para:
+                body = self.inline.render("\n".join(s.strip() for s in para))
+                out.append(body if tight else f"<p>{body}</p>")
+                para.clear()
+
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+            if not stripped:
+                flush()
+                i += 1
+                continue
+            fence = _open_fence(line)
+            if fence:
+                flush()
+                i = self._code(lines, i, fence, out)
+                continue
+            heading = _HEADING_RE.match(line) if stripped.startswith("#") else None
+            if heading:
+                flush()
+                text = (heading.group(2) or "").strip()
+                level = len(heading.group(1))
+                slug = self.slugger.slug(text)
+                self.headings.append(Heading(offset + i, level, text, slug))
+                out.append(
+                    f'<h{level} id="{self.id_prefix}{slug}">'
+                    f"{self.inline.render(text)}</h{level}>"
+                )
+                i += 1
+                continue
+            if _HR_RE.match(line) and not para:
+                out.append("<hr>")
+                i += 1
+                continue
+            if stripped.startswith(">"):
+                flush()
+                i = self._quote(lines, i, out, offset)
+                continue
+            if _LIST_RE.match(line) and (not para or not line.startswith(" ")):
+                flush()
+                i = self._list(lines, i, out, offset)
+                continue
+            if (
+                "|" in line
+                and i + 1 < len(lines)
+                and _TABLE_SEP_RE.match(lines[i + 1])
+                and "-" in lines[i + 1]
+            ):
+                flush()
+                i = self._table(lines, i, out)
+                continue
+            if stripped.startswith("<") and not para and _TAG_RE.match(stripped):
+                out.append(line)
+                i += 1
+                continue
+            para.append(line)
+            i += 1
+        flush()
+        return "\n".join(out)
+
+    def _code(self, lines: list[str], i: int, fence: re.Match[str], out: list[str]) -> int:
+        indent, marker, info = len(fence.group(1)), fence.group(2), fence.group(3).strip()
+        body = []
+        i += 1
+        while i < len(lines):
+            line = lines[i]
+            i += 1
+            if _closes_fence(line, marker):
+                break
+            body.append(line[min(indent, len(line) - len(line.lstrip(" "))) :])
+        lang = info.split()[0] if info else ""
+        cls = f' class="language-{html.escape(lang)}"' if lang else ""
+        code = html.escape("\n".join(body) + ("\n" if body else ""), quote=False)
+        out.append(f"<pre><code{cls}>{code}</code></pre>")
+        return i
+
+    def _quote(self, lines: list[str], i: int, out: list[str], offset: int) -> int:
+        start = i
+        inner = []
+        while i < len(lines) and lines[i].strip().startswith(">"):
+            text = lines[i].strip()[1:]
+            inner.append(text[1:] if text.startswith(" ") else text)
+            i += 1
+        kind = _ALERT_RE.match(inner[0].strip()) if inner else None
+        if kind:
+            body = self.render(inner[1:], offset=offset + start + 1)
+            name = kind.group(1).lower()
+            out.append(
+                f'<blockquote class="alert alert-{name}">'
+                f'<p class="alert-title">{name.title()}</p>\n{body}</blockquote>'
+            )
+        else:
+            out.append(f"<blockquote>\n{self.render(inner, offset=offset + start)}\n</blockquote>")
+        return i
+
+    def _list(self, lines: list[str], i: int, out: list[str], offset: int) -> int:
+        first = _LIST_RE.match(lines[i])
+        assert first is not None
+        base = len(first.group(1))
+        ordered = first.group(2)[0].isdigit()
+        items: list[tuple[int, list[str]]] = []
+        loose = False
+        while i < len(lines):
+            match = _LIST_RE.match(lines[i])
+            if not match or len(match.group(1)) != base or match.group(2)[0].isdigit() != ordered:
+                break
+            content = base + len(match.group(2)) + max(1, len(match.group(3)))
+            body = [match.group(4)]
+            start = i
+            i += 1
+            while i < len(lines):
+                line = lines[i]
+                if not line.strip():
+                    nxt = next((l for l in lines[i + 1 :] if l.strip()), None)
+                    if nxt is None:
+                        break
+                    indent = len(nxt) - len(nxt.lstrip(" "))
+                    if indent >= content:
+                        body.append("")
+                        i += 1
+                        continue
+                    sibling = _LIST_RE.match(nxt)
+                    if sibling and len(sibling.group(1)) == base:
+                        loose = True
+                    break
+                indent = len(line) - len(line.lstrip(" "))
+                if indent >= content:
+                    body.append(line[content:])
+                elif _LIST_RE.match(line) and indent <= base:
+                    break
+                elif indent > base and _LIST_RE.match(line):
+                    body.append(line[min(indent, content) :])
+                elif (
+                    not _LIST_RE.match(line)
+                    and not line.lstrip().startswith(("#", ">", "```", "~~~"))
+                    and not _HR_RE.match(line)
+                ):
+                    body.append(line.strip())
+                else:
+                    break
+                i += 1
+            items.append((start, body))
+            while i < len(lines) and not lines[i].strip():
+                nxt = next((l for l in lines[i + 1 :] if l.strip()), None)
+                sibling = _LIST_RE.match(nxt) if nxt else None
+                if not sibling or len(sibling.group(1)) != base:
+                    break
+                i += 1
+        tag = "ol" if ordered else "ul"
+        start_attr = ""
+        if ordered and first.group(2)[:-1] != "1":
+            start_attr = f' start="{int(first.group(2)[:-1])}"'
+        rendered = []
+        for start, body in items:
+            task = ""
+            if body and body[0][:3] in ("[ ]", "[x]", "[X]"):
+                checked = " checked" if body[0][1] != " " else ""
+                task = f'<input type="checkbox" disabled{checked}> '
+                body = [body[0][3:].lstrip(), *body[1:]]
+            inner = self.render(body, tight=not loose, offset=offset + start)
+            rendered.append(f"<li>{task}{inner}</li>")
+        out.append(f"<{tag}{start_attr}>\n" + "\n".join(rendered) + f"\n</{tag}>")
+        return i
+
+    def _table(self, lines: list[str], i: int, out: list[str]) -> int:
+        def cells(row: str) -> list[str]:
+            row = row.strip()
+            if row.startswith("|"):
+                row = row[1:]
+            if row.endswith("|") and not row.endswith("\\|"):
+                row = row[:-1]
+            return [c.strip().replace("\\|", "|") for c in re.split(r"(?<!\\)\|", row)]
+
+        header = cells(lines[i])
+        aligns = []
+        for spec in cells(lines[i + 1]):
+            left, right = spec.startswith(":"), spec.endswith(":")
+            aligns.append(
+                "center" if left and right else "right" if right else "left" if left else ""
+            )
+
+        def row_html(row: list[str], tag: str) -> str:
+            parts = []
+            for n, cell in enumerate(row[: len(header)] + [""] * (len(header) - len(row))):
+                align = aligns[n] if n < len(aligns) else ""
+                style = f' style="text-align:{align}"' if align else ""
+                parts.append(f"<{tag}{style}>{self.inline.render(cell)}</{tag}>")
+            return "<tr>" + "".join(parts) + "</tr>"
+
+        body = []
+        i += 2
+        while i < len(lines) and lines[i].strip() and "|" in lines[i]:
+            body.append(row_html(cells(lines[i]), "td"))
+            i += 1
+        out.append(
+            "<table>\n<thead>"
+            + row_html(header, "th")
+            + "</thead>\n<tbody>\n"
+            + "\n".join(body)
+            + "\n</tbody>\n</table>"
+        )
+        return i
+
+
+def render(
+    text: str,
+    link_hook: LinkHook | None = None,
+    id_prefix: str = "",
+    first_line: int = 1,
+) -> Rendered:
+    """Render markdown ``text`` (without frontmatter) to an HTML fragment.
+
+    ``link_hook`` receives every link ``href`` and returns the href to emit
+    plus extra attributes; ``id_prefix`` namespaces heading ids so several
+    documents can share one HTML page.
+    """
+    blocks = _Blocks(_Inline(link_hook), Slugger(), id_prefix)
+    body = blocks.render(text.splitlines(), offset=first_line)
+    return Rendered(body, blocks.headings)
+
+
+# ---------------------------------------------------------------------------
+# Sections
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Section:
+    """A heading and the bytes it owns, up to the next heading at ``max_level``.
+
+    ``start``/``end`` are byte offsets into the file, so a section can be
+    sliced straight out of the source with one ``seek`` and ``read``.
+    Text before the first qualifying heading forms a section keyed by the
+    document's H1 (or an empty heading when there is none).
+    """
+
+    heading: str
+    level: int
+    slug: str
+    line: int
+    start: int
+    end: int
+
+
+def split_sections(data: bytes, body_line: int = 1, max_level: int = 3) -> list[Section]:
+    """Split a whole file (frontmatter included) into sections.
+
+    ``body_line`` is where the body starts (see
+    :func:`booktools.corpus.split_frontmatter`); frontmatter lines are never
+    part of a section.
+    """
+    raw_lines = data.splitlines(keepends=True)
+    offsets = [0]
+    for raw in raw_lines:
+        offsets.append(offsets[-1] + len(raw))
+    lines = [raw.decode("utf-8").rstrip("\r\n") for raw in raw_lines[body_line - 1 :]]
+    headings, _ = scan(lines, body_line)
+    sections: list[Section] = []
+    start_line = body_line
+    title, level, slug = "", 1, ""
+    for heading in headings:
+        if heading.level == 1 and not sections and not title:
+            title, slug = heading.text, heading.slug
+            if not any(line.strip() for line in lines[: heading.line - body_line]):
+                start_line = heading.line
+            continue
+        if heading.level > max_level:
+            continue
+        if heading.line > start_line or sections or title:
+            sections.append(
+                Section(title, level, slug, start_line, offsets[start_line - 1], offsets[heading.line - 1])
+            )
+        start_line = heading.line
+        title, level, slug = heading.text, heading.level, heading.slug
+    if start_line <= len(raw_lines):
+        sections.append(
+            Section(title, level, slug, start_line, offsets[start_line - 1], offsets[-1])
+        )
+    return sections
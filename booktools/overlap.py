@@ -0,0 +1,307 @@
+"""Near-duplicate paragraph detection with MinHash and locality-sensitive hashing.
+
+Every prose paragraph (fenced code excluded) is reduced to a set of word
+5-gram shingles and summarised by a MinHash signature.  Signatures use
+one-permutation hashing with rotation densification: each shingle is hashed
+once and dropped into one of ``NUM_BINS`` bins, which keeps signing linear in
+the paragraph length instead of linear times the number of permutations.
+
+Signatures are split into ``BANDS`` bands; paragraphs sharing any band
+bucket become candidate pairs, and only those candidates are compared.  With
+16 bands of 4 rows, pairs at Jaccard 0.5 collide with probability ~0.65 and
+pairs at 0.8 with probability ~1.0, while unrelated paragraphs almost never
+meet, so the work grows with the number of similar pairs rather than with
+the square of the corpus.
+
+Signatures are cached per file content hash in ``.booktools/overlap.json``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from booktools import markdown
+from booktools.corpus import cache_dir, knowledge_base_root, load_index, split_frontmatter
+
+SIGNATURE_VERSION = 1
+CACHE_FILE = "overlap.json"
+SHINGLE_SIZE = 5
+NUM_BINS = 64
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+MIN_WORDS = 25
+PARALLEL_THRESHOLD = 32
+_EMPTY = 0xFFFFFFFF
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MARKUP_RE = re.compile(r"\]\([^)]*\)|`[^`]*`|[*_>#|\[\]]")
+
+
+# ---------------------------------------------------------------------------
+# Paragraphs and signatures
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Paragraph:
+    path: str
+    line: int
+    heading: str
+    preview: str
+    signature: array
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.line}"
+
+
+def iter_paragraphs(text: str) -> Iterator[tuple[int, str, str]]:
+    """Yield ``(line, heading, text)`` for prose paragraphs outside code fences."""
+    _, body, first_line = split_frontmatter(text)
+    heading = ""
+    block: list[str] = []
+    start = 0
+    last = first_line - 1
+    for number, line in markdown.iter_prose(body.splitlines(), first_line):
+        stripped = line.strip()
+        boundary = number != last + 1
+        last = number
+        if stripped.startswith("#"):
+            if block:
+                yield start, heading, " ".join(block)
+                block = []
+            heading = stripped.lstrip("#").strip()
+            continue
+        if not stripped or boundary or stripped in ("---", "***"):
+            if block:
+                yield start, heading, " ".join(block)
+                block = []
+            if not stripped or stripped in ("---", "***"):
+                continue
+        if not block:
+            start = number
+        block.append(stripped)
+    if block:
+        yield start, heading, " ".join(block)
+
+
+def signature(words: list[str]) -> array:
+    """One-permutation MinHash over word shingles, densified by rotation."""
+    bins = array("I", [_EMPTY]) * NUM_BINS
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i : i + SHINGLE_SIZE]).encode("utf-8")
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little")
+        slot = h % NUM_BINS
+        value = h >> 32
+        if value < bins[slot]:
+            bins[slot] = value
+    if _EMPTY in bins and any(v != _EMPTY for v in bins):
+        filled = array("I", bins)
+        for slot in range(NUM_BINS):
+            distance = 1
+            while bins[slot] == _EMPTY:
+                donor = filled[(slot + distance) % NUM_BINS]
+                if donor != _EMPTY:
+                    bins[slot] = (donor + distance * 0x9E3779B1) & 0xFFFFFFFE
+                distance += 1
+    return bins
+
+
+def sign_file(job: tuple[str, str]) -> tuple[str, list[list[Any]]]:
+    """Process-pool worker: ``(root, path)`` -> encoded paragraph signatures."""
+    root, rel = job
+    text = (Path(root) / rel).read_text("utf-8")
+    rows = []
+    for line, heading, paragraph in iter_paragraphs(text):
+        words = _WORD_RE.findall(_MARKUP_RE.sub(" ", paragraph).lower())
+        if len(words) < MIN_WORDS:
+            continue
+        preview = " ".join(paragraph.split()[:16])
+        encoded = base64.b64encode(signature(words).tobytes()).decode("ascii")
+        rows.append([line, heading, preview, encoded])
+    return rel, rows
+
+
+def _decode(encoded: str) -> array:
+    sig = array("I")
+    sig.frombytes(base64.b64decode(encoded))
+    return sig
+
+
+def load_paragraphs(root: Path, jobs: int | None = None) -> tuple[list[Paragraph], int]:
+    """Return every signed paragraph and how many files had to be re-hashed."""
+    corpus = load_index(root)
+    cache_path = cache_dir(root) / CACHE_FILE
+    try:
+        data = json.loads(cache_path.read_text("utf-8"))
+        previous = data["files"] if data.get("version") == SIGNATURE_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        previous = {}
+    files: dict[str, dict[str, Any]] = {}
+    todo = []
+    for rel, entry in sorted(corpus.entries.items()):
+        cached = previous.get(rel)
+        if cached and cached["digest"] == entry.digest:
+            files[rel] = cached
+        else:
+            files[rel] = {"digest": entry.digest, "paragraphs": []}
+            todo.append((str(root), rel))
+    workers = jobs or os.cpu_count() or 1
+    if len(todo) >= PARALLEL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            signed = list(pool.map(sign_file, todo, chunksize=4))
+    else:
+        signed = [sign_file(job) for job in todo]
+    for rel, rows in signed:
+        files[rel]["paragraphs"] = rows
+    if todo or set(previous) != set(files):
+        tmp = cache_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": SIGNATURE_VERSION, "files": files}, separators=(",", ":")),
+            "utf-8",
+        )
+        os.replace(tmp, cache_path)
+    paragraphs = [
+        Paragraph(rel, line, heading, preview, _decode(encoded))
+        for rel, info in files.items()
+        for line, heading, preview, encoded in info["paragraphs"]
+    ]
+    return paragraphs, len(todo)
+
+
+# ---------------------------------------------------------------------------
+# LSH and clustering
+# ---------------------------------------------------------------------------
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity: the fraction of agreeing bins."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+def candidate_pairs(paragraphs: list[Paragraph]) -> set[tuple[int, int]]:
+    buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+    for n, paragraph in enumerate(paragraphs):
+        raw = paragraph.signature.tobytes()
+        for band in range(BANDS):
+            buckets[(band, raw[band * ROWS * 4 : (band + 1) * ROWS * 4])].append(n)
+    pairs = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1 :]:
+                pairs.add((first, second))
+    return pairs
+
+
+@dataclass
+class Cluster:
+    members: list[Paragraph]
+    similarity: float
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "similarity": round(self.similarity, 3),
+            "members": [
+                {"path": p.path, "line": p.line, "heading": p.heading, "preview": p.preview}
+                for p in self.members
+            ],
+        }
+
+
+def find_clusters(
+    paragraphs: list[Paragraph], threshold: float, cross_file: bool = False
+) -> tuple[list[Cluster], int]:
+    """Group near-duplicate paragraphs; returns clusters and candidates compared."""
+    parent = list(range(len(paragraphs)))
+    best: dict[int, float] = {}
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    pairs = candidate_pairs(paragraphs)
+    for a, b in pairs:
+        if cross_file and paragraphs[a].path == paragraphs[b].path:
+            continue
+        score = similarity(paragraphs[a].signature, paragraphs[b].signature)
+        if score < threshold:
+            continue
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+        root = find(a)
+        best[root] = max(best.get(root, 0.0), best.pop(rb, 0.0), score)
+    groups: dict[int, list[Paragraph]] = defaultdict(list)
+    for n, paragraph in enumerate(paragraphs):
+        groups[find(n)].append(paragraph)
+    clusters = [
+        Cluster(sorted(members, key=lambda p: (p.path, p.line)), best.get(root, 0.0))
+        for root, members in groups.items()
+        if len(members) > 1
+    ]
+    clusters.sort(key=lambda c: (-c.similarity, -len(c.members), c.members[0].location))
+    return clusters, len(pairs)
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    paragraphs, rehashed = load_paragraphs(root, args.jobs)
+    clusters, compared = find_clusters(paragraphs, args.threshold, args.cross_file)
+    elapsed = time.perf_counter() - started
+    if args.json:
+        json.dump(
+            {
+                "paragraphs": len(paragraphs),
+                "rehashed_files": rehashed,
+                "candidates": compared,
+                "elapsed_ms": round(elapsed * 1000, 2),
+                "clusters": [c.to_json() for c in clusters],
+            },
+            sys.stdout,
+            indent=2,
+        )
+        sys.stdout.write("\n")
+    else:
+        for cluster in clusters:
+            print(f"~{cluster.similarity:.2f} similar, {len(cluster.members)} passages")
+            for p in cluster.members:
+                print(f"  {p.location}  [{p.heading}]  {p.preview}…")
+            print()
+    print(
+        f"overlap: {len(paragraphs)} paragraphs ({rehashed} files re-hashed), "
+        f"{compared} candidate pairs, {len(clusters)} clusters, in {elapsed * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "overlap", help="find near-duplicate paragraphs across chapters (MinHash/LSH)"
+    )
+    parser.add_argument(
+        "-t", "--threshold", type=float, default=0.5, help="minimum estimated Jaccard similarity"
+    )
+    parser.add_argument(
+        "--cross-file", action="store_true", help="ignore repeats within a single file"
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="hashing processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="emit clusters as JSON")
+    parser.set_defaults(func=run)
@@ -0,0 +1,537 @@
+"""Related-content engine: section neighbours, Connections and RUBRIC checks.
+
+Every section becomes a TF-IDF vector over the search tokenizer's term
+counts (reused from ``.booktools/search/sections.json``) plus its entry's
+frontmatter ``tags``.  Scores are accumulated from an inverted index of the
+sparse rows: with NumPy installed, a block of rows at a time from CSR
+arrays (never a dense vocabulary-wide matrix or a full section-by-section
+product); without it, one row at a time in pure Python, more slowly.  The
+top ``TOP_K`` cross-file neighbours of each section are cached in
+``.booktools/related.json``.
+
+When only a few files change, only their sections and the sections whose
+neighbour lists pointed into them are re-ranked; every other list is merged
+with the new scores.  Pairs that were not re-ranked keep the IDF weights of
+the run that scored them until more than ``REBUILD_FRACTION`` of the sections
+change (or ``--rebuild`` is given).
+
+From the neighbour lists the engine suggests links missing from each
+entry's ``## Connections`` section, and ``--rubric`` flags RUBRIC.md chapter
+mappings that rank in the bottom half of chapters for their dimension.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from booktools import markdown, search
+from booktools.corpus import (
+    cache_dir,
+    knowledge_base_root,
+    load_index,
+    relative_paths,
+    split_frontmatter,
+)
+from booktools.links import resolve
+
+try:  # optional: vectorised similarity; a sparse pure-Python path is used otherwise
+    import numpy
+except ImportError:  # pragma: no cover - depends on the environment
+    numpy = None
+
+CACHE_VERSION = 1
+CACHE_FILE = "related.json"
+TOP_K = 10
+MIN_SCORE = 0.05
+MIN_TERMS = 12
+TAG_TF = 2
+MIN_STRENGTH = 0.1
+REBUILD_FRACTION = 0.2
+BLOCK_CELLS = 1 << 22
+SKIP_HEADINGS = markdown.REFERENCE_HEADINGS | {"connections", "see also"}
+_DIMENSION_RE = re.compile(r"^## Dimension \d+: (.+)$")
+_MAPPING_RE = re.compile(r"^- \*\*Level (\d)\*\*: (.*)$")
+
+
+# ---------------------------------------------------------------------------
+# Vectors
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Vectors:
+    """Unit-length TF-IDF rows, one per indexed section."""
+
+    keys: list[str] = field(default_factory=list)
+    meta: list[list[Any]] = field(default_factory=list)
+    rows: list[dict[str, float]] = field(default_factory=list)
+    idf: dict[str, float] = field(default_factory=dict)
+    # Inverted indexes built on first use by each scorer and reused after.
+    postings: Any = None
+    csr: Any = None
+
+    def path(self, row: int) -> str:
+        return self.meta[row][0]
+
+
+def _weight(tf: float, idf: float) -> float:
+    return (1.0 + math.log(tf)) * idf
+
+
+def build_vectors(files: dict[str, Any], tags: dict[str, list[str]]) -> Vectors:
+    """Turn cached search sections into normalised TF-IDF rows."""
+    vectors = Vectors()
+    counts = []
+    for rel, info in sorted(files.items()):
+        features = {f"#{tag.lower()}": TAG_TF for tag in tags.get(rel, ())}
+        for n, section in enumerate(info["sections"]):
+            if section["length"] < MIN_TERMS or section["heading"].lower() in SKIP_HEADINGS:
+                continue
+            vectors.keys.append(f"{rel}#{n}")
+            vectors.meta.append([rel, section["heading"], section["slug"], section["line"]])
+            counts.append({**section["tf"], **features})
+    df = Counter(term for tf in counts for term in tf)
+    total = len(counts)
+    vectors.idf = {term: math.log((1 + total) / (1 + n)) + 1.0 for term, n in df.items()}
+    for tf in counts:
+        row = {term: _weight(n, vectors.idf[term]) for term, n in tf.items()}
+        norm = math.sqrt(sum(w * w for w in row.values())) or 1.0
+        # Terms seen in a single section cannot contribute to any pair.
+        vectors.rows.append({t: w / norm for t, w in row.items() if df[t] > 1})
+    return vectors
+
+
+def _score_rows_python(
+    vectors: Vectors, rows: list[int], limit: int | None = None
+) -> list[list[tuple[int, float]]]:
+    """Cross-file neighbours of ``rows``, best first, via an inverted index.
+
+    Always defined: it is the fallback and the reference the NumPy path is
+    tested against.
+    """
+    if vectors.postings is None:
+        vectors.postings = defaultdict(list)
+        for j, row in enumerate(vectors.rows):
+            for term, weight in row.items():
+                vectors.postings[term].append((j, weight))
+    postings = vectors.postings
+    result = []
+    for i in rows:
+        own = vectors.path(i)
+        acc: dict[int, float] = defaultdict(float)
+        for term, weight in vectors.rows[i].items():
+            for j, other in postings[term]:
+                acc[j] += weight * other
+        hits = [
+            (j, s) for j, s in acc.items() if s >= MIN_SCORE and vectors.path(j) != own
+        ]
+        if limit is not None:
+            result.append(heapq.nlargest(limit, hits, key=lambda h: (h[1], -h[0])))
+        else:
+            result.append(sorted(hits, key=lambda h: (-h[1], h[0])))
+    return result
+
+
+if numpy is not None:
+    BACKEND = "numpy"
+
+    def _ranges(starts: Any, counts: Any) -> Any:
+        """Concatenate ``arange(start, start + count)`` for each pair."""
+        ends = numpy.cumsum(counts)
+        return numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - ends + counts, counts)
+
+    def _postings(vectors: Vectors) -> tuple[Any, ...]:
+        """Section-major and term-major CSR arrays for ``vectors.rows``, built once."""
+        if vectors.csr is None:
+            vocab: dict[str, int] = {}
+            lengths = numpy.fromiter((len(row) for row in vectors.rows), numpy.int64, len(vectors.rows))
+            indptr = numpy.concatenate(([0], numpy.cumsum(lengths)))
+            total = int(indptr[-1])
+            terms = numpy.fromiter(
+                (vocab.setdefault(t, len(vocab)) for row in vectors.rows for t in row), numpy.int64, total
+            )
+            weights = numpy.fromiter((w for row in vectors.rows for w in row.values()), numpy.float64, total)
+            owner = numpy.repeat(numpy.arange(len(vectors.rows)), lengths)
+            order = numpy.argsort(terms, kind="stable")
+            postptr = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(terms, minlength=len(vocab)))))
+            vectors.csr = (indptr, terms, weights, postptr, owner[order], weights[order])
+        return vectors.csr
+
+    def score_rows(
+        vectors: Vectors, rows: list[int], limit: int | None = None
+    ) -> list[list[tuple[int, float]]]:
+        """Cross-file neighbours of ``rows``, best first, a block of rows at a time.
+
+        Each block's scores are accumulated from the term postings of its
+        rows, so memory is bounded by ``BLOCK_CELLS`` and the postings rather
+        than by the vocabulary or the square of the section count.
+        """
+        indptr, terms, weights, postptr, post_rows, post_weights = _postings(vectors)
+        n = len(vectors.rows)
+        files = {path: i for i, path in enumerate(dict.fromkeys(m[0] for m in vectors.meta))}
+        owner = numpy.fromiter((files[m[0]] for m in vectors.meta), dtype=numpy.int32, count=n)
+        step = max(1, BLOCK_CELLS // max(n, 1))
+        result = []
+        for start in range(0, len(rows), step):
+            block = numpy.asarray(rows[start : start + step], dtype=numpy.int64)
+            counts = indptr[block + 1] - indptr[block]
+            entries = _ranges(indptr[block], counts)
+            query_terms = terms[entries]
+            spans = postptr[query_terms + 1] - postptr[query_terms]
+            hits = _ranges(postptr[query_terms], spans)
+            local = numpy.repeat(numpy.repeat(numpy.arange(len(block)), counts), spans)
+            scores = numpy.bincount(
+                local * n + post_rows[hits],
+                weights=numpy.repeat(weights[entries], spans) * post_weights[hits],
+                minlength=len(block) * n,
+            ).reshape(len(block), n)
+            scores[owner[block][:, None] == owner[None, :]] = 0.0
+            for line in scores:
+                if limit is not None and limit < n:
+                    cols = numpy.sort(numpy.argpartition(-line, limit)[:limit])
+                    cols = cols[line[cols] >= MIN_SCORE]
+                else:
+                    cols = numpy.flatnonzero(line >= MIN_SCORE)
+                cols = cols[numpy.argsort(-line[cols], kind="stable")]
+                result.append(list(zip(cols.tolist(), line[cols].tolist())))
+        return result
+
+else:
+    BACKEND = "python"
+    score_rows = _score_rows_python
+
+
+# ---------------------------------------------------------------------------
+# Neighbour cache
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Neighbours:
+    sections: dict[str, list[Any]]
+    rescored: int
+    rebuilt: bool
+    vectors: Vectors | None = None
+    elapsed: float = 0.0
+
+    def by_file(self) -> dict[str, list[tuple[str, list[Any]]]]:
+        grouped: dict[str, list[tuple[str, list[Any]]]] = defaultdict(list)
+        for key, info in self.sections.items():
+            grouped[info[0]].append((key, info))
+        return grouped
+
+
+def _merge(old: list[list[Any]], extra: list[tuple[str, float]], index: dict[str, int]) -> list[list[Any]]:
+    """Top ``TOP_K`` of a cached list and new scores, ordered as ``score_rows`` orders them."""
+    merged = {key: score for key, score in old}
+    merged.update(extra)
+    best = heapq.nsmallest(TOP_K, merged.items(), key=lambda kv: (-kv[1], index[kv[0]]))
+    return [[key, score] for key, score in best]
+
+
+def refresh(root: Path, rebuild: bool = False, need_vectors: bool = False) -> Neighbours:
+    """Bring the cached top-k neighbour lists up to date."""
+    started = time.perf_counter()
+    corpus = load_index(root)
+    digests = {rel: entry.digest for rel, entry in corpus.entries.items()}
+    cache_path = cache_dir(root) / CACHE_FILE
+    try:
+        data = json.loads(cache_path.read_text("utf-8"))
+        previous = data if data.get("version") == CACHE_VERSION else {}
+    except (OSError, ValueError):
+        previous = {}
+    old_digests = previous.get("digests", {})
+    changed = {rel for rel, digest in digests.items() if old_digests.get(rel) != digest}
+    changed |= set(old_digests) - set(digests)
+    if previous and not changed and not rebuild and not need_vectors:
+        return Neighbours(previous["sections"], 0, False, elapsed=time.perf_counter() - started)
+
+    search.refresh(root)
+    store = json.loads((cache_dir(root) / "search" / search.SECTIONS_FILE).read_text("utf-8"))
+    tags = {rel: [str(t) for t in entry.meta.get("tags") or []] for rel, entry in corpus.entries.items()}
+    vectors = build_vectors(store["files"], tags)
+    index = {key: i for i, key in enumerate(vectors.keys)}
+    old = previous.get("sections", {})
+
+    fresh = [i for i, key in enumerate(vectors.keys) if vectors.path(i) in changed or key not in old]
+    full = rebuild or not previous or len(fresh) > REBUILD_FRACTION * max(len(vectors.keys), 1)
+    sections: dict[str, list[Any]] = {}
+    if full:
+        ranked = score_rows(vectors, list(range(len(vectors.keys))), TOP_K)
+        for i, hits in enumerate(ranked):
+            sections[vectors.keys[i]] = [*vectors.meta[i], [[vectors.keys[j], s] for j, s in hits]]
+        rescored = len(ranked)
+    elif not changed:
+        sections = old
+        rescored = 0
+    else:
+        fresh_set = set(fresh)
+        # Lists that lost a neighbour must be re-ranked from scratch.
+        broken = [
+            i
+            for i, key in enumerate(vectors.keys)
+            if i not in fresh_set
+            and any(other not in index or vectors.path(index[other]) in changed for other, _ in old[key][4])
+        ]
+        incoming: dict[int, list[tuple[str, float]]] = defaultdict(list)
+        for i, hits in zip(fresh, score_rows(vectors, fresh)):
+            sections[vectors.keys[i]] = [
+                *vectors.meta[i],
+                [[vectors.keys[j], s] for j, s in hits[:TOP_K]],
+            ]
+            for j, score in hits:
+                incoming[j].append((vectors.keys[i], score))
+        for i, hits in zip(broken, score_rows(vectors, broken, TOP_K)):
+            sections[vectors.keys[i]] = [*vectors.meta[i], [[vectors.keys[j], s] for j, s in hits]]
+        for i, key in enumerate(vectors.keys):
+            if key not in sections:
+                sections[key] = [*vectors.meta[i], _merge(old[key][4], incoming.get(i, []), index)]
+        rescored = len(fresh) + len(broken)
+
+    # Scores are cached unrounded: merged lists are re-ranked against them.
+    tmp = cache_path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps(
+            {"version": CACHE_VERSION, "digests": digests, "sections": sections},
+            separators=(",", ":"),
+        ),
+        "utf-8",
+    )
+    os.replace(tmp, cache_path)
+    return Neighbours(sections, rescored, full, vectors, time.perf_counter() - started)
+
+
+# ---------------------------------------------------------------------------
+# Connections suggestions
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    path: str
+    target: str
+    strength: float
+    via: str
+    target_heading: str
+
+
+def connection_links(root: Path, rel: str) -> set[str] | None:
+    """Root-relative targets linked from ``rel``'s Connections section."""
+    data = (root / rel).read_bytes()
+    _, _, body_line = split_frontmatter(data.decode("utf-8"))
+    for section in markdown.split_sections(data, body_line, max_level=2):
+        if section.heading.lower() == "connections":
+            lines = data[section.start : section.end].decode("utf-8").splitlines()
+            targets = {resolve(rel, link.href)[0] for link in markdown.scan(lines, section.line)[1]}
+            return {t for t in targets if t}
+    return None
+
+
+def _covered(target: str, linked: set[str]) -> bool:
+    """A link to a chapter's ``_index.md`` covers every entry in that chapter."""
+    if target in linked:
+        return True
+    parent = target.rsplit("/", 1)[0]
+    return f"{parent}/_index.md" in linked
+
+
+def suggest(root: Path, neighbours: Neighbours, per_file: int = 3, scope: set[str] | None = None) -> list[Suggestion]:
+    """Strongly related entries missing from each entry's Connections section.
+
+    The strength of ``A -> B`` is the summed neighbour score from ``A``'s
+    sections into ``B``, divided by the number of sections in ``A``.
+    """
+    suggestions = []
+    for rel, sections in sorted(neighbours.by_file().items()):
+        if scope is not None and rel not in scope:
+            continue
+        strength: dict[str, float] = defaultdict(float)
+        best: dict[str, tuple[float, str, str]] = {}
+        for _, (_, heading, _, _, hits) in sections:
+            for other, score in hits:
+                target, target_heading = neighbours.sections[other][:2]
+                strength[target] += score
+                if score > best.get(target, (0.0, "", ""))[0]:
+                    best[target] = (score, heading, target_heading)
+        linked = connection_links(root, rel) or set()
+        ranked = sorted(strength.items(), key=lambda kv: (-kv[1], kv[0]))
+        picked = 0
+        for target, total in ranked:
+            if picked >= per_file:
+                break
+            if total / len(sections) < MIN_STRENGTH:
+                break
+            if _covered(target, linked):
+                continue
+            _, via, target_heading = best[target]
+            suggestions.append(Suggestion(rel, target, total / len(sections), via, target_heading))
+            picked += 1
+    return suggestions
+
+
+# ---------------------------------------------------------------------------
+# RUBRIC mapping check
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Mapping:
+    dimension: str
+    level: int
+    target: str
+    score: float
+    rank: int
+    of: int
+
+    @property
+    def stale(self) -> bool:
+        return self.rank > self.of // 2
+
+
+def _cosine(a: dict[str, float], b: dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+
+def _normalise(row: dict[str, float]) -> dict[str, float]:
+    norm = math.sqrt(sum(w * w for w in row.values())) or 1.0
+    return {t: w / norm for t, w in row.items()}
+
+
+def check_rubric(root: Path, vectors: Vectors) -> tuple[list[Mapping], dict[str, list[tuple[str, float]]]]:
+    """Score every RUBRIC chapter mapping against its dimension's own text.
+
+    Returns every mapping (``stale`` when the chapter ranks in the bottom
+    half of entries for that dimension) and, per dimension, the best-ranked
+    entries that are not mapped at any level.
+    """
+    entries: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for i, row in enumerate(vectors.rows):
+        for term, weight in row.items():
+            entries[vectors.path(i)][term] += weight
+    entry_vectors = {rel: _normalise(row) for rel, row in entries.items()}
+
+    dimensions: list[tuple[str, list[str], list[tuple[int, list[str]]]]] = []
+    current = None
+    for line in (root / "RUBRIC.md").read_text("utf-8").splitlines():
+        match = _DIMENSION_RE.match(line)
+        if match:
+            current = (match.group(1), [match.group(1)], [])
+            dimensions.append(current)
+        elif line.startswith("## "):
+            current = None
+        elif current is not None:
+            mapping = _MAPPING_RE.match(line)
+            if mapping:
+                targets = [resolve("RUBRIC.md", link.href)[0] for link in markdown.scan([line])[1]]
+                current[2].append((int(mapping.group(1)), [t for t in targets if t]))
+            else:
+                current[1].append(line)
+
+    mappings: list[Mapping] = []
+    candidates: dict[str, list[tuple[str, float]]] = {}
+    for name, text, levels in dimensions:
+        tf = Counter(search.tokenize("\n".join(text)))
+        query = _normalise(
+            {t: _weight(n, vectors.idf[t]) for t, n in tf.items() if t in vectors.idf}
+        )
+        ranking = sorted(
+            ((rel, _cosine(query, vec)) for rel, vec in entry_vectors.items()),
+            key=lambda kv: (-kv[1], kv[0]),
+        )
+        # Tied entries share the lowest rank of their tie, so an unrelated
+        # (zero-score) chapter ranks last rather than by its path.
+        last = {score: n for n, (_, score) in enumerate(ranking, 1)}
+        position = {rel: last[score] for rel, score in ranking}
+        scores = dict(ranking)
+        mapped = set()
+        for level, targets in levels:
+            for target in targets:
+                # A directory link (an example project) counts as its best entry.
+                members = [rel for rel in scores if rel == target or rel.startswith(f"{target}/")]
+                best = min(members, key=position.__getitem__, default=target)
+                mapped.update(members or [target])
+                mappings.append(
+                    Mapping(name, level, target, scores.get(best, 0.0), position.get(best, len(ranking)), len(ranking))
+                )
+        candidates[name] = [(rel, score) for rel, score in ranking if rel not in mapped][:3]
+    return mappings, candidates
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    paths = relative_paths(root, args.paths, "related")
+    if paths is None:
+        return 2
+    scope = set(paths) or None
+    neighbours = refresh(root, rebuild=args.rebuild, need_vectors=args.rubric)
+    report: dict[str, Any] = {"backend": BACKEND, "sections": len(neighbours.sections)}
+
+    if args.rubric:
+        mappings, candidates = check_rubric(root, neighbours.vectors)
+        stale = [m for m in mappings if m.stale]
+        report["rubric"] = {
+            "stale": [vars(m) for m in stale],
+            "candidates": {name: [[rel, round(s, 4)] for rel, s in best] for name, best in candidates.items()},
+        }
+        if not args.json:
+            for m in stale:
+                where = f"RUBRIC.md: {m.dimension} / Level {m.level}: {m.target}"
+                if not m.score:
+                    print(f"{where} has no indexed prose")
+                else:
+                    print(f"{where} ranks {m.rank}/{m.of} for this dimension (score {m.score:.3f})")
+            for name, best in candidates.items():
+                listed = ", ".join(f"{rel} ({score:.3f})" for rel, score in best)
+                print(f"RUBRIC.md: {name}: strongest unmapped: {listed}")
+    else:
+        suggestions = suggest(root, neighbours, args.limit, scope)
+        report["suggestions"] = [vars(s) | {"strength": round(s.strength, 4)} for s in suggestions]
+        if scope:
+            report["neighbours"] = {
+                key: [*info[:4], [[other, round(s, 4)] for other, s in info[4]]]
+                for key, info in neighbours.sections.items()
+                if info[0] in scope
+            }
+        if not args.json:
+            for s in suggestions:
+                print(
+                    f"{s.path}: Connections could link {s.target} ({s.strength:.3f}; "
+                    f"\"{s.via}\" ~ \"{s.target_heading}\")"
+                )
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    print(
+        f"related: {len(neighbours.sections)} sections ({BACKEND}; {neighbours.rescored} re-ranked"
+        f"{', full rebuild' if neighbours.rebuilt else ''}) "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "related", help="suggest missing Connections links and check RUBRIC mappings"
+    )
+    parser.add_argument("paths", nargs="*", help="only report on these entries")
+    parser.add_argument("-n", "--limit", type=int, default=3, help="suggestions per entry")
+    parser.add_argument("--rubric", action="store_true", help="check RUBRIC.md chapter mappings")
+    parser.add_argument("--rebuild", action="store_true", help="re-rank every section")
+    parser.add_argument("--json", action="store_true", help="emit a JSON report")
+    parser.set_defaults(func=run)
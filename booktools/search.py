@@ -0,0 +1,414 @@
+"""Section-level BM25 search over the book, backed by a memory-mapped index.
+
+Every ``#``/``##``/``###`` section of every source file is one document.  The
+on-disk index (``.booktools/search/index.bin``) is a flat little-endian
+layout that queries read through ``mmap`` without deserialising anything:
+
+    header   magic, version, section count, term count, average length,
+             then the byte offset of every block below
+    terms    sorted UTF-8 term blob plus ``uint32`` offsets (binary search)
+    postings per-term ``uint32`` section ids and ``uint16`` term frequencies
+    lengths  ``uint32`` token count per section
+    records  ``path\\tlevel\\theading\\tslug\\tline\\tstart\\tend`` per section
+
+Tokenised sections are cached per file content hash in ``sections.json``, so
+a refresh re-tokenises only changed files before re-packing the index.  A
+small ``manifest.json`` of indexed digests lets an unchanged tree skip even
+that.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from booktools import markdown
+from booktools.corpus import CACHE_DIR, cache_dir, knowledge_base_root, load_index, split_frontmatter
+
+MAGIC = b"BKS1"
+FORMAT_VERSION = 1
+TOKENIZER_VERSION = 1
+INDEX_FILE = "index.bin"
+SECTIONS_FILE = "sections.json"
+MANIFEST_FILE = "manifest.json"
+HEADING_WEIGHT = 3
+K1 = 1.2
+B = 0.75
+
+_HEADER = struct.Struct("<4sIIIf8Q")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MAX_TF = 0xFFFF
+STOPWORDS = frozenset(
+    """a an and are as at be but by can do does for from has have how if in into is it
+    its not of on or so such that the their then there these this to was were what when
+    which while who will with without""".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with stopwords dropped and plurals folded."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+
+def tokenize_file(data: bytes) -> list[dict[str, Any]]:
+    """Split a file into sections and count prose tokens (code fences skipped)."""
+    text = data.decode("utf-8")
+    _, _, body_line = split_frontmatter(text)
+    lines = text.splitlines()
+    sections = []
+    for section in markdown.split_sections(data, body_line):
+        first = section.line
+        # A final line without a newline still belongs to the last section.
+        last = first + len(data[section.start : section.end].splitlines())
+        prose = [line for _, line in markdown.iter_prose(lines[first - 1 : last - 1], first)]
+        counts = Counter(tokenize("\n".join(prose[1:] if section.heading else prose)))
+        for token in tokenize(section.heading):
+            counts[token] += HEADING_WEIGHT
+        sections.append(
+            {
+                **asdict(section),
+                "length": sum(counts.values()),
+                "tf": dict(counts),
+            }
+        )
+    return sections
+
+
+def _write_index(path: Path, docs: list[tuple[str, dict[str, Any]]]) -> None:
+    postings: dict[str, list[tuple[int, int]]] = {}
+    lengths = array("I")
+    records = []
+    for doc_id, (rel, section) in enumerate(docs):
+        lengths.append(section["length"])
+        records.append(
+            "\t".join(
+                [
+                    rel,
+                    str(section["level"]),
+                    section["heading"].replace("\t", " "),
+                    section["slug"],
+                    str(section["line"]),
+                    str(section["start"]),
+                    str(section["end"]),
+                ]
+            ).encode("utf-8")
+        )
+        for term, tf in section["tf"].items():
+            postings.setdefault(term, []).append((doc_id, min(tf, _MAX_TF)))
+
+    terms = sorted(postings)
+    term_blob = bytearray()
+    term_offsets = array("I", [0])
+    post_offsets = array("I", [0])
+    post_docs = array("I")
+    post_tfs = array("H")
+    for term in terms:
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        for doc_id, tf in postings[term]:
+            post_docs.append(doc_id)
+            post_tfs.append(tf)
+        post_offsets.append(len(post_docs))
+    record_blob = b"".join(records)
+    record_offsets = array("I", [0])
+    for record in records:
+        record_offsets.append(record_offsets[-1] + len(record))
+
+    blocks = [
+        term_offsets.tobytes(),
+        bytes(term_blob),
+        post_offsets.tobytes(),
+        post_docs.tobytes(),
+        post_tfs.tobytes(),
+        lengths.tobytes(),
+        record_offsets.tobytes(),
+        record_blob,
+    ]
+    positions = []
+    cursor = _HEADER.size
+    for block in blocks:
+        cursor += (-cursor) % 4
+        positions.append(cursor)
+        cursor += len(block)
+    avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as handle:
+        handle.write(
+            _HEADER.pack(MAGIC, FORMAT_VERSION, len(docs), len(terms), avgdl, *positions)
+        )
+        for position, block in zip(positions, blocks):
+            handle.write(b"\0" * (position - handle.tell()))
+            handle.write(block)
+    os.replace(tmp, path)
+
+
+@dataclass
+class RefreshReport:
+    files: int
+    retokenized: int
+    sections: int
+    rebuilt: bool
+    elapsed: float
+
+
+def refresh(root: Path, force: bool = False) -> RefreshReport:
+    """Re-tokenise changed files and re-pack the index when anything changed."""
+    started = time.perf_counter()
+    corpus = load_index(root)
+    store = cache_dir(root) / "search"
+    store.mkdir(exist_ok=True)
+    index_path = store / INDEX_FILE
+    manifest_path = store / MANIFEST_FILE
+    digests = {rel: entry.digest for rel, entry in corpus.entries.items()}
+    if not force and index_path.exists():
+        try:
+            indexed = json.loads(manifest_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            indexed = None
+        if indexed == {"version": TOKENIZER_VERSION, "files": digests}:
+            return RefreshReport(
+                files=len(digests),
+                retokenized=0,
+                sections=_section_count(index_path),
+                rebuilt=False,
+                elapsed=time.perf_counter() - started,
+            )
+
+    cache_path = store / SECTIONS_FILE
+    try:
+        cached = json.loads(cache_path.read_text("utf-8"))
+        if cached.get("version") != TOKENIZER_VERSION:
+            cached = {}
+    except (OSError, ValueError):
+        cached = {}
+    files = cached.get("files", {})
+
+    retokenized = 0
+    current: dict[str, Any] = {}
+    for rel, entry in sorted(corpus.entries.items()):
+        previous = files.get(rel)
+        if not force and previous and previous["digest"] == entry.digest:
+            current[rel] = previous
+            continue
+        current[rel] = {
+            "digest": entry.digest,
+            "last_updated": str(entry.meta.get("last_updated", "")),
+            "sections": tokenize_file((root / rel).read_bytes()),
+        }
+        retokenized += 1
+
+    docs = [(rel, section) for rel, info in current.items() for section in info["sections"]]
+    _write_index(index_path, docs)
+    for path, payload in (
+        (cache_path, {"version": TOKENIZER_VERSION, "files": current}),
+        (manifest_path, {"version": TOKENIZER_VERSION, "files": digests}),
+    ):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), "utf-8")
+        os.replace(tmp, path)
+    return RefreshReport(
+        files=len(current),
+        retokenized=retokenized,
+        sections=len(docs),
+        rebuilt=True,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def _section_count(index_path: Path) -> int:
+    with open(index_path, "rb") as handle:
+        return _HEADER.unpack(handle.read(_HEADER.size))[2]
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Hit:
+    score: float
+    path: str
+    level: int
+    heading: str
+    slug: str
+    line: int
+    start: int
+    end: int
+
+    def to_json(self) -> dict[str, Any]:
+        return {**asdict(self), "score": round(self.score, 4)}
+
+
+class SearchIndex:
+    """Read-only view over ``index.bin``; cheap to open, cheaper to query."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, version, self.size, self.term_count, self.avgdl, *pos = _HEADER.unpack_from(
+            view
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a booktools search index")
+        n, t = self.size, self.term_count
+        self._term_offsets = view[pos[0] : pos[0] + 4 * (t + 1)].cast("I")
+        self._terms = view[pos[1] : pos[1] + self._term_offsets[t]]
+        self._post_offsets = view[pos[2] : pos[2] + 4 * (t + 1)].cast("I")
+        total = self._post_offsets[t]
+        self._post_docs = view[pos[3] : pos[3] + 4 * total].cast("I")
+        self._post_tfs = view[pos[4] : pos[4] + 2 * total].cast("H")
+        self._lengths = view[pos[5] : pos[5] + 4 * n].cast("I")
+        self._record_offsets = view[pos[6] : pos[6] + 4 * (n + 1)].cast("I")
+        self._records = view[pos[7] : pos[7] + self._record_offsets[n]]
+
+    def close(self) -> None:
+        for name in (
+            "_term_offsets",
+            "_terms",
+            "_post_offsets",
+            "_post_docs",
+            "_post_tfs",
+            "_lengths",
+            "_record_offsets",
+            "_records",
+        ):
+            getattr(self, name).release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _term(self, n: int) -> bytes:
+        return bytes(self._terms[self._term_offsets[n] : self._term_offsets[n + 1]])
+
+    def _lookup(self, term: str) -> int:
+        key = term.encode("utf-8")
+        n = bisect_left(range(self.term_count), key, key=self._term)
+        return n if n < self.term_count and self._term(n) == key else -1
+
+    def record(self, doc_id: int) -> tuple[str, int, str, str, int, int, int]:
+        raw = bytes(self._records[self._record_offsets[doc_id] : self._record_offsets[doc_id + 1]])
+        path, level, heading, slug, line, start, end = raw.decode("utf-8").split("\t")
+        return path, int(level), heading, slug, int(line), int(start), int(end)
+
+    def scores(self, terms: Iterable[str]) -> dict[int, float]:
+        """BM25 score for every section matching at least one term."""
+        scores: dict[int, float] = {}
+        lengths = self._lengths
+        norm = K1 * (1 - B)
+        slope = K1 * B / (self.avgdl or 1.0)
+        for term, weight in Counter(terms).items():
+            n = self._lookup(term)
+            if n < 0:
+                continue
+            lo, hi = self._post_offsets[n], self._post_offsets[n + 1]
+            df = hi - lo
+            idf = weight * math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            docs = self._post_docs[lo:hi]
+            tfs = self._post_tfs[lo:hi]
+            for doc_id, tf in zip(docs, tfs):
+                score = idf * tf * (K1 + 1) / (tf + norm + slope * lengths[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> list[Hit]:
+        scores = self.scores(tokenize(query))
+        best = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+        return [Hit(score, *self.record(doc_id)) for doc_id, score in best]
+
+
+def snippet(root: Path, hit: Hit, width: int = 160) -> str:
+    """First prose line of a hit's section, read by byte offset."""
+    with open(root / hit.path, "rb") as handle:
+        handle.seek(hit.start)
+        chunk = handle.read(min(hit.end - hit.start, 4096)).decode("utf-8", "replace")
+    lines = chunk.splitlines()[1:] if hit.heading else chunk.splitlines()
+    for _, line in markdown.iter_prose(lines):
+        text = line.strip().lstrip("-*>|# ").strip()
+        if len(text) > 20:
+            return text if len(text) <= width else text[: width - 1] + "…"
+    return ""
+
+
+def run(args: argparse.Namespace) -> int:
+    root = knowledge_base_root(args.root)
+    index_path = root / CACHE_DIR / "search" / INDEX_FILE
+    if args.rebuild or not args.no_refresh or not index_path.exists():
+        report = refresh(root, force=args.rebuild)
+        print(
+            f"search: {report.files} files, {report.sections} sections "
+            f"({report.retokenized} files re-tokenised, "
+            f"{'index rebuilt' if report.rebuilt else 'index reused'}) "
+            f"in {report.elapsed * 1000:.1f} ms",
+            file=sys.stderr,
+        )
+    if not args.query:
+        return 0
+    query = " ".join(args.query)
+    with SearchIndex(index_path) as index:
+        started = time.perf_counter()
+        hits = index.search(query, args.limit)
+        elapsed = time.perf_counter() - started
+    if args.json:
+        payload = []
+        for hit in hits:
+            item = hit.to_json()
+            item["snippet"] = snippet(root, hit)
+            payload.append(item)
+        json.dump({"query": query, "elapsed_ms": round(elapsed * 1000, 3), "hits": payload}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for hit in hits:
+            print(f"{hit.score:7.2f}  {hit.path}:{hit.line}#{hit.slug}")
+            print(f"         {'#' * hit.level} {hit.heading}")
+            text = snippet(root, hit)
+            if text:
+                print(f"         {text}")
+    print(f"search: {len(hits)} hits in {elapsed * 1000:.3f} ms", file=sys.stderr)
+    return 0 if hits else 1
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "search", help="ranked full-text search over book sections (BM25)"
+    )
+    parser.add_argument("query", nargs="*", help="search terms (omit to only refresh)")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="maximum hits")
+    parser.add_argument("--json", action="store_true", help="emit hits as JSON")
+    parser.add_argument(
+        "--no-refresh", action="store_true", help="query the existing index without a stat pass"
+    )
+    parser.add_argument("--rebuild", action="store_true", help="re-tokenise every file")
+    parser.set_defaults(func=run)
@@ -0,0 +1,436 @@
+"""Incremental, parallel HTML build of the web edition.
+
+A build runs in three phases:
+
+1. **Scan.**  Every page is stat-checked against ``.booktools/site/state.json``.
+   Only changed pages are read, hashed, and scanned for their *interface*:
+   title, heading slugs, and outgoing ``.md`` links.
+2. **Plan.**  Each page's output depends on its own source plus the interface
+   of every page it links to and its previous/next neighbours in reading
+   order (``_index.md`` files and ``TABLE_OF_CONTENTS.md`` list pages through
+   ordinary links, so they fall out of the same edges).  The cache key is a
+   hash over exactly those inputs, so editing a paragraph re-renders one page
+   while renaming a heading also re-renders the pages that link to it.
+3. **Render.**  Pages whose key is missing from the content-addressed object
+   store are rendered in a process pool; everything else is copied from the
+   store (or left alone when the output already matches).
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import os
+import posixpath
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from booktools import markdown
+from booktools.corpus import (
+    cache_dir,
+    content_hash,
+    knowledge_base_root,
+    order_key,
+    parse_frontmatter,
+    scan_documents,
+    split_frontmatter,
+)
+
+RENDER_VERSION = "1"
+STATE_FILE = "state.json"
+DEFAULT_OUTPUT = "_site"
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title} · Agentic Engineering</title>
+<link rel="stylesheet" href="{base}style.css">
+</head>
+<body>
+<nav class="crumbs"><a href="{base}index.html">Agentic Engineering</a>{up}</nav>
+<main>
+{body}
+</main>
+<nav class="pager">{prev}{next}</nav>
+</body>
+</html>
+"""
+
+STYLESHEET = """body{max-width:46rem;margin:2rem auto;padding:0 1rem;font:16px/1.6 system-ui,sans-serif;color:#1f2328}
+pre{background:#f6f8fa;padding:1rem;overflow:auto}code{font-size:.9em}
+table{border-collapse:collapse}th,td{border:1px solid #d0d7de;padding:.3rem .6rem}
+blockquote{margin:0;padding:0 1rem;border-left:.25rem solid #d0d7de;color:#59636e}
+.alert-caution,.alert-warning{border-color:#d1242f}.alert-title{font-weight:600}
+a.broken-link{color:#d1242f;text-decoration:line-through}
+.crumbs,.pager{display:flex;gap:1rem;font-size:.9rem}.pager{justify-content:space-between;margin-top:3rem}
+"""
+
+
+@dataclass
+class Page:
+    """A source page and the interface other pages' output depends on."""
+
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+    title: str
+    order: str = ""
+    slugs: list[str] = field(default_factory=list)
+    links: list[str] = field(default_factory=list)
+
+    @property
+    def interface(self) -> str:
+        """Hash of what dependents see: title and heading slugs."""
+        return content_hash("\x1f".join([self.title, *self.slugs]).encode("utf-8"))
+
+
+def output_path(source: str) -> str:
+    """Map a source path to its output path (root README becomes index.html)."""
+    if source == "README.md":
+        return "index.html"
+    return source[:-3] + ".html"
+
+
+def relative_href(from_source: str, to_output: str) -> str:
+    return posixpath.relpath(to_output, posixpath.dirname(from_source) or ".")
+
+
+def resolve_target(source: str, href: str) -> tuple[str, str] | None:
+    """Resolve a relative ``.md`` href from ``source`` to ``(path, fragment)``."""
+    target, _, fragment = href.partition("#")
+    if not target:
+        return source, fragment
+    if "://" in target or target.startswith(("mailto:", "/")) or not target.endswith(".md"):
+        return None
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+    return resolved, fragment
+
+
+def scan_page(root: Path, rel: str, st: os.stat_result) -> Page:
+    data = (root / rel).read_bytes()
+    text = data.decode("utf-8")
+    header, body, first_line = split_frontmatter(text)
+    meta = parse_frontmatter(header)
+    lines = body.splitlines()
+    headings, links = markdown.scan(lines, first_line)
+    title = str(meta.get("title") or next((h.text for h in headings if h.level == 1), rel))
+    targets = sorted(
+        {
+            target
+            for link in links
+            if (resolved := resolve_target(rel, link.href)) and (target := resolved[0]) != rel
+        }
+    )
+    return Page(
+        path=rel,
+        mtime_ns=st.st_mtime_ns,
+        size=st.st_size,
+        digest=content_hash(data),
+        title=title,
+        order=str(meta.get("order", "")),
+        slugs=[h.slug for h in headings],
+        links=targets,
+    )
+
+
+@dataclass
+class BuildReport:
+    pages: int = 0
+    scanned: int = 0
+    rendered: int = 0
+    copied: int = 0
+    unchanged: int = 0
+    phases: dict[str, float] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "scanned": self.scanned,
+            "rendered": self.rendered,
+            "copied": self.copied,
+            "unchanged": self.unchanged,
+            "phases_ms": {k: round(v * 1000, 2) for k, v in self.phases.items()},
+            "pages_ms": {
+                k: round(v * 1000, 2)
+                for k, v in sorted(self.timings.items(), key=lambda kv: -kv[1])
+            },
+        }
+
+
+class SiteBuilder:
+    def __init__(self, root: Path, output: Path, jobs: int | None = None):
+        self.root = root
+        self.output = output
+        self.jobs = jobs or os.cpu_count() or 1
+        self.store = cache_dir(root) / "site"
+        self.objects = self.store / "objects"
+        self.pages: dict[str, Page] = {}
+        self.keys: dict[str, str] = {}
+        self.previous_keys: dict[str, str] = {}
+
+    # -- state ---------------------------------------------------------------
+
+    def _load_state(self) -> dict[str, Page]:
+        try:
+            data = json.loads((self.store / STATE_FILE).read_text("utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != RENDER_VERSION:
+            return {}
+        self.previous_keys = data.get("keys", {})
+        return {path: Page(path=path, **fields) for path, fields in data["pages"].items()}
+
+    def _save_state(self) -> None:
+        payload = {
+            "version": RENDER_VERSION,
+            "pages": {
+                path: {k: v for k, v in vars(page).items() if k != "path"}
+                for path, page in sorted(self.pages.items())
+            },
+            "keys": self.keys,
+        }
+        tmp = self.store / (STATE_FILE + ".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), "utf-8")
+        os.replace(tmp, self.store / STATE_FILE)
+
+    # -- phases --------------------------------------------------------------
+
+    def scan(self) -> int:
+        previous = self._load_state()
+        scanned = 0
+        for rel, st in scan_documents(self.root):
+            cached = previous.get(rel)
+            if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                self.pages[rel] = cached
+                continue
+            self.pages[rel] = scan_page(self.root, rel, st)
+            scanned += 1
+        return scanned
+
+    def reading_order(self) -> list[str]:
+        ordered = [p for p in self.pages.values() if p.order]
+        ordered.sort(key=lambda p: (order_key(p.order), p.path))
+        return [p.path for p in ordered]
+
+    def dependencies(self) -> dict[str, set[str]]:
+        """Page -> pages whose interface its output embeds."""
+        deps = {path: {t for t in page.links if t in self.pages} for path, page in self.pages.items()}
+        sequence = self.reading_order()
+        for n, path in enumerate(sequence):
+            if n:
+                deps[path].add(sequence[n - 1])
+            if n + 1 < len(sequence):
+                deps[path].add(sequence[n + 1])
+            up = posixpath.join(posixpath.dirname(path), "_index.md")
+            if up != path and up in self.pages:
+                deps[path].add(up)
+        return deps
+
+    def dependents(self) -> dict[str, set[str]]:
+        """Reverse graph: page -> pages that must re-render when it changes."""
+        reverse: dict[str, set[str]] = {path: set() for path in self.pages}
+        for path, deps in self.dependencies().items():
+            for dep in deps:
+                reverse[dep].add(path)
+        return reverse
+
+    def plan(self) -> dict[str, dict[str, Any]]:
+        """Compute cache keys and the render context for every page."""
+        deps = self.dependencies()
+        sequence = self.reading_order()
+        position = {path: n for n, path in enumerate(sequence)}
+        contexts = {}
+        for path, page in self.pages.items():
+            parts = [RENDER_VERSION, content_hash(TEMPLATE.encode()), page.digest]
+            parts += [f"{d}:{self.pages[d].interface}" for d in sorted(deps[path])]
+            self.keys[path] = content_hash("\n".join(parts).encode("utf-8"))
+
+            def nav(target: str | None) -> list[str] | None:
+                if target is None:
+                    return None
+                return [relative_href(path, output_path(target)), self.pages[target].title]
+
+            n = position.get(path)
+            up = posixpath.join(posixpath.dirname(path), "_index.md")
+            contexts[path] = {
+                "title": page.title,
+                "base": relative_href(path, "index.html")[: -len("index.html")],
+                "targets": {
+                    d: {"title": self.pages[d].title, "slugs": self.pages[d].slugs}
+                    for d in deps[path] | {path}
+                },
+                "prev": nav(sequence[n - 1] if n else None),
+                "next": nav(sequence[n + 1] if n is not None and n + 1 < len(sequence) else None),
+                "up": nav(up if up != path and up in self.pages else None),
+            }
+        return contexts
+
+    def build(self, force: bool = False) -> BuildReport:
+        report = BuildReport()
+        started = time.perf_counter()
+        report.scanned = self.scan()
+        report.pages = len(self.pages)
+        report.phases["scan"] = time.perf_counter() - started
+
+        mark = time.perf_counter()
+        contexts = self.plan()
+        self.objects.mkdir(parents=True, exist_ok=True)
+        todo = [
+            path
+            for path in sorted(self.pages)
+            if force or not (self.objects / f"{self.keys[path]}.html").exists()
+        ]
+        report.phases["plan"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        jobs = [(str(self.root), path, contexts[path]) for path in todo]
+        if len(jobs) > 1 and self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(jobs))) as pool:
+                results = pool.map(render_page, jobs, chunksize=max(1, len(jobs) // (self.jobs * 4)))
+                self._store(results, report)
+        else:
+            self._store(map(render_page, jobs), report)
+        report.phases["render"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        self._publish(report)
+        self._prune()
+        self._save_state()
+        report.phases["publish"] = time.perf_counter() - mark
+        report.phases["total"] = time.perf_counter() - started
+        return report
+
+    def _store(self, results: Any, report: BuildReport) -> None:
+        for path, page_html, elapsed in results:
+            target = self.objects / f"{self.keys[path]}.html"
+            tmp = target.with_suffix(".tmp")
+            tmp.write_text(page_html, "utf-8")
+            os.replace(tmp, target)
+            report.timings[path] = elapsed
+            report.rendered += 1
+
+    def _publish(self, report: BuildReport) -> None:
+        self.output.mkdir(parents=True, exist_ok=True)
+        stylesheet = self.output / "style.css"
+        if not stylesheet.exists() or stylesheet.read_text("utf-8") != STYLESHEET:
+            stylesheet.write_text(STYLESHEET, "utf-8")
+        manifest_path = self.output / ".manifest.json"
+        try:
+            published = json.loads(manifest_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            published = {}
+        for path, key in self.keys.items():
+            target = self.output / output_path(path)
+            if published.get(path) == key and target.exists():
+                report.unchanged += 1
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            data = (self.objects / f"{key}.html").read_bytes()
+            target.write_bytes(data)
+            if path not in report.timings:
+                report.copied += 1
+        for path in set(published) - set(self.keys):
+            (self.output / output_path(path)).unlink(missing_ok=True)
+        manifest_path.write_text(json.dumps(self.keys, sort_keys=True), "utf-8")
+
+    def _prune(self) -> None:
+        """Drop objects referenced by neither this build nor the previous one."""
+        keys = {*self.keys.values(), *self.previous_keys.values()}
+        live = {f"{key}.html" for key in keys}
+        for entry in os.scandir(self.objects):
+            if entry.name not in live:
+                os.unlink(entry.path)
+
+
+def render_page(job: tuple[str, str, dict[str, Any]]) -> tuple[str, str, float]:
+    """Process-pool worker: render one page to a complete HTML document."""
+    root, path, context = job
+    started = time.perf_counter()
+    text = (Path(root) / path).read_text("utf-8")
+    _, body, first_line = split_frontmatter(text)
+    targets = context["targets"]
+
+    def link_hook(href: str) -> tuple[str, dict[str, str]]:
+        resolved = resolve_target(path, href)
+        if resolved is None:
+            return href, {}
+        target, fragment = resolved
+        fragment = fragment.lower()
+        info = targets.get(target)
+        if info is None or (fragment and fragment not in info["slugs"]):
+            return href, {"class": "broken-link"}
+        new = "" if target == path else relative_href(path, output_path(target))
+        attrs = {} if target == path else {"title": info["title"]}
+        return new + (f"#{fragment}" if fragment else ""), attrs
+
+    rendered = markdown.render(body, link_hook=link_hook, first_line=first_line)
+
+    def nav(key: str, label: str) -> str:
+        item = context.get(key)
+        if not item:
+            return "<span></span>"
+        return f'<a rel="{key}" href="{html.escape(item[0])}">{label}{html.escape(item[1])}</a>'
+
+    up = context.get("up")
+    page_html = TEMPLATE.format(
+        title=html.escape(context["title"]),
+        base=context["base"],
+        up=f' / <a href="{html.escape(up[0])}">{html.escape(up[1])}</a>' if up else "",
+        body=rendered.html,
+        prev=nav("prev", "← "),
+        next=nav("next", "→ "),
+    )
+    return path, page_html, time.perf_counter() - started
+
+
+def _print_report(report: BuildReport, top: int) -> None:
+    phases = ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in report.phases.items())
+    print(
+        f"site: {report.pages} pages ({report.scanned} scanned, {report.rendered} rendered, "
+        f"{report.copied} restored from cache, {report.unchanged} unchanged); {phases}",
+        file=sys.stderr,
+    )
+    slowest = sorted(report.timings.items(), key=lambda kv: -kv[1])[:top]
+    for path, elapsed in slowest:
+        print(f"  {elapsed * 1000:8.1f} ms  {path}", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> int:
+    root = knowledge_base_root(args.root)
+    output = Path(args.output) if args.output else root / DEFAULT_OUTPUT
+    builder = SiteBuilder(root, output, jobs=args.jobs)
+    if args.affected:
+        builder.scan()
+        reverse = builder.dependents()
+        for path in args.affected:
+            print(path)
+            for dependent in sorted(reverse.get(path, ())):
+                print(f"  {dependent}")
+        return 0
+    report = builder.build(force=args.force)
+    _print_report(report, args.top)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report.to_json(), indent=2) + "\n", "utf-8")
+    return 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser("site", help="incrementally build the HTML web edition")
+    parser.add_argument("-o", "--output", help=f"output directory (default: {DEFAULT_OUTPUT}/)")
+    parser.add_argument("-j", "--jobs", type=int, help="render processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render every page")
+    parser.add_argument("--report", help="write the per-page timing report as JSON")
+    parser.add_argument("--top", type=int, default=10, help="slowest pages to print")
+    parser.add_argument(
+        "--affected", nargs="+", metavar="PATH", help="list pages that depend on PATH and exit"
+    )
+    parser.set_defaults(func=run)
@@ -0,0 +1,89 @@
+"""Shared fixtures: a tiny knowledge base built fresh for every test."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+BOOK = {
+    "chapters/1-basics/_index.md": """---
+title: Basics
+order: 1.0.0
+part: 1
+part_title: Foundations
+chapter: 1
+section: 0
+tags: [agents, prompts]
+---
+
+# Basics
+
+The basics chapter introduces agents and prompts.
+""",
+    "chapters/1-basics/1-intro.md": """---
+title: "Introduction: Agents"
+order: 1.1.0
+part: 1
+chapter: 1
+section: 1
+tags:
+  - agents
+  - loops
+---
+
+# Introduction
+
+## Agent loops
+
+An agent loop alternates between a model call and a tool call.
+
+## Tools
+
+Tools give the loop its reach.
+""",
+    "chapters/2-context/_index.md": """---
+title: Context
+order: 2.0.0
+part: 1
+chapter: 2
+section: 0
+tags: [context]
+---
+
+# Context
+
+Context windows bound what an agent can see at once.
+""",
+}
+
+
+def write(root: Path, rel: str, text: str) -> Path:
+    """Write ``rel`` under ``root`` and move its mtime forward.
+
+    Caches validate by ``(mtime_ns, size)``; bumping the mtime keeps an edit
+    visible even on filesystems with coarse timestamps.
+    """
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    previous = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text, "utf-8")
+    stamp = max(path.stat().st_mtime_ns, previous + 1_000_000_000)
+    os.utime(path, ns=(stamp, stamp))
+    return path
+
+
+@pytest.fixture
+def book(tmp_path: Path) -> Path:
+    """A knowledge base root holding :data:`BOOK`."""
+    for rel, text in BOOK.items():
+        write(tmp_path, rel, text)
+    return tmp_path
+
+
+@pytest.fixture
+def edit(book: Path) -> Callable[[str, str], Path]:
+    """Write a file in :func:`book` so that every cache sees the change."""
+    return lambda rel, text: write(book, rel, text)
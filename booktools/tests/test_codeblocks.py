@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+
+import pytest
+
+from booktools import codeblocks
+from booktools.codeblocks import VALIDATORS, check_tree, extract
+
+CASES = {
+    "python": ("def f(x):\n    return x\n", "def f(:\n"),
+    "json": ('// config.json\n{"a": [1, 2]}\n', '{"a": 1,}\n'),
+    "yaml": ("a:\n  - 1\n---\nb: 2\n", "a: [1\nb: 2\n"),
+    "bash": ("for f in *; do\n  echo \"$f\"\ndone\n", "if true; then\n  echo\n"),
+    "javascript": ("export const f = (x) => x * 2;\n", "const = 1;\n"),
+    "xml": ('<?xml version="1.0"?>\n<a/><b>text</b>\n', "<a><b></a>\n"),
+}
+NEEDS = {"yaml": lambda: codeblocks.yaml is not None, "javascript": lambda: shutil.which("node") is not None}
+
+
+@pytest.mark.parametrize("lang", sorted(CASES))
+def test_validator_passes_and_fails(lang):
+    if lang in NEEDS and not NEEDS[lang]():
+        pytest.skip(f"no {lang} validator available")
+    good, bad = CASES[lang]
+    assert VALIDATORS[lang](good).status == "pass"
+    result = VALIDATORS[lang](bad)
+    assert result.status == "fail"
+    assert result.message
+
+
+def test_extract_records_heading_skip_marker_and_indent():
+    text = (
+        "---\ntitle: T\n---\n# T\n\n## Setup\n\n<!-- code: skip -->\n```python\ndef (\n```\n\n"
+        "- item\n\n  ```json skip-validate\n  {}\n  ```\n\n### Run\n\n~~~sh\necho hi\n~~~\n"
+    )
+    blocks = [(b.line, b.lang, b.heading, b.skip, source) for b, source in extract("t.md", text)]
+    assert blocks == [
+        (9, "python", "Setup", True, "def (\n"),
+        (15, "json", "Setup", True, "{}\n"),
+        (21, "sh", "Run", False, "echo hi\n"),
+    ]
+
+
+def test_tree_reports_failures_and_unclosed_fences(book, edit):
+    edit(
+        "chapters/1-basics/2-code.md",
+        "# Code\n\n```python\nx = 1\n```\n\n```python\nx = (\n```\n\n## Tail\n\n```bash\necho never closed\n",
+    )
+    report = check_tree(book, jobs=1)
+    failures = report.failures()
+    assert [(b.line, b.lang) for b, _ in failures] == [(7, "python"), (13, "bash")]
+    assert failures[1][1].message == "code fence is never closed"
+    assert report.validated == 2
+
+    again = check_tree(book, jobs=1)
+    assert (again.validated, again.rescanned) == (0, 0)
+    assert len(again.failures()) == 2
+
+
+def test_unavailable_results_are_retried_not_cached(book, edit, monkeypatch):
+    edit("chapters/1-basics/2-code.md", "# Code\n\n```yaml\na: 1\n```\n")
+    monkeypatch.setattr(codeblocks, "yaml", None)
+    first = check_tree(book, jobs=1)
+    assert [r.status for _, r in first.blocks] == ["unavailable"]
+    cache = json.loads((book / ".booktools" / codeblocks.CACHE_FILE).read_text("utf-8"))
+    assert cache["results"] == {}
+
+    monkeypatch.undo()
+    if codeblocks.yaml is None:
+        pytest.skip("PyYAML is not installed")
+    second = check_tree(book, jobs=1)
+    assert (second.validated, [r.status for _, r in second.blocks]) == (1, ["pass"])
+
+
+def test_missing_paths_are_skipped(book, monkeypatch, capsys):
+    monkeypatch.chdir(book)
+    args = argparse.Namespace(root=str(book), paths=["chapters/gone.md"], jobs=1, verbose=False, json=False)
+    assert codeblocks.run(args) == 0
+    assert "skipping chapters/gone.md: no such file" in capsys.readouterr().err
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import booktools
+from booktools import context
+from booktools.context import MIN_SECTION_TOKENS, SectionIndex, build_pack, count_tokens
+
+WORDS = "agent loop tool model context window budget prompt plan review memory cache".split()
+
+
+@pytest.fixture
+def sized_book(book, edit):
+    """Sections of very different lengths across several tagged entries."""
+    rng = random.Random(7)
+    for n in range(6):
+        sections = []
+        for s in range(4):
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 400)))
+            sections.append(f"## Part {s}\n\n{words}.\n")
+        tags = "[agents, budget]" if n % 2 else "[context]"
+        edit(
+            f"chapters/3-sized/{n + 1}-entry.md",
+            f"---\ntitle: Entry {n}\norder: 3.{n + 1}.0\ntags: {tags}\n---\n\n# Entry {n}\n\n" + "\n".join(sections),
+        )
+    return book
+
+
+@pytest.mark.parametrize("budget", [0, 40, 150, 333, 900, 2500, 10_000])
+def test_pack_never_exceeds_budget(sized_book, budget):
+    index = SectionIndex(sized_book).refresh()
+    for tags, query in ((["agents"], ""), (["context", "budget"], ""), ([], "model cache window")):
+        pack = build_pack(sized_book, budget, tags, query, index)
+        assert pack.tokens <= budget
+        assert count_tokens(pack.render(sized_book)) <= budget
+        if budget >= 2500:
+            assert pack.sections
+
+
+def test_pack_prefers_tagged_sections_in_reading_order(sized_book):
+    pack = build_pack(sized_book, 10_000, ["context"])
+    assert pack.sections
+    assert all("context" in ref.tags for ref in pack.sections)
+    assert all(ref.tokens >= MIN_SECTION_TOKENS for ref in pack.sections)
+    keys = [(ref.order, ref.start) for ref in pack.sections]
+    assert keys == sorted(keys, key=lambda k: (tuple(int(p) for p in k[0].split(".")), k[1]))
+
+
+def test_index_reindexes_only_changed_files(sized_book, edit):
+    assert SectionIndex(sized_book).refresh().reindexed == 9
+    assert SectionIndex(sized_book).refresh().reindexed == 0
+    edit("chapters/3-sized/1-entry.md", "---\ntitle: Entry 0\norder: 3.1.0\n---\n\n# Entry 0\n")
+    assert SectionIndex(sized_book).refresh().reindexed == 1
+
+
+class _OfflineTiktoken:
+    calls = 0
+
+    def get_encoding(self, name):
+        self.calls += 1
+        raise ConnectionError("no network")
+
+
+def test_unloadable_encoding_falls_back_to_the_estimate(monkeypatch):
+    offline = _OfflineTiktoken()
+    monkeypatch.setattr(context, "tiktoken", offline)
+    monkeypatch.setattr(context, "_ENCODING", None)
+    monkeypatch.setattr(context, "ESTIMATOR", "tiktoken:cl100k_base")
+    assert count_tokens("one two, three") == 4
+    assert context.estimator() == "heuristic"
+    count_tokens("again")
+    assert offline.calls == 1
+
+
+def test_commands_that_never_count_tokens_never_load_tiktoken(book, tmp_path):
+    fake = tmp_path / "fake" / "tiktoken"
+    fake.mkdir(parents=True)
+    (fake / "__init__.py").write_text("def get_encoding(name):\n    raise ConnectionError('offline')\n")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(fake.parent), str(Path(booktools.__file__).parents[1])])}
+    for command in (["links"], ["toc", "--check"], ["lint"]):
+        proc = subprocess.run(
+            [sys.executable, "-m", "booktools", "--root", str(book), *command],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        assert "Traceback" not in proc.stderr, proc.stderr
+        assert "tiktoken" not in proc.stderr
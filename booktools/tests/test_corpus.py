@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import booktools
+
+from booktools.corpus import (
+    FrontmatterIndex,
+    load_index,
+    order_key,
+    parse_frontmatter,
+    relative_paths,
+    split_frontmatter,
+)
+from booktools import toc
+from booktools.toc import render_toc
+
+
+def test_split_frontmatter_reports_body_line():
+    header, body, body_line = split_frontmatter("---\ntitle: A\n---\n# A\n")
+    assert header == "title: A\n"
+    assert body == "# A\n"
+    assert body_line == 4
+
+
+def test_split_frontmatter_without_header():
+    assert split_frontmatter("# A\n") == ("", "# A\n", 1)
+    assert split_frontmatter("---\nunterminated\n") == ("", "---\nunterminated\n", 1)
+
+
+def test_parse_frontmatter_scalars_and_lists():
+    meta = parse_frontmatter(
+        "title: \"Quoted: \\\"yes\\\"\"\n"
+        "single: 'it''s'\n"
+        "order: 1.2.0\n"
+        "chapter: 3\n"
+        "tags: [a, b]\n"
+        "# a comment\n"
+        "aliases:\n"
+        "  - one\n"
+        "  - 2\n"
+        "empty:\n"
+    )
+    assert meta == {
+        "title": 'Quoted: "yes"',
+        "single": "it's",
+        "order": "1.2.0",
+        "chapter": 3,
+        "tags": ["a", "b"],
+        "aliases": ["one", 2],
+        "empty": "",
+    }
+
+
+def test_order_key_sorts_numerically():
+    assert order_key("2.10.0") > order_key("2.9.0")
+    assert order_key("") == ()
+    assert order_key(None) == ()
+
+
+def test_refresh_parses_then_reuses(book):
+    index = FrontmatterIndex.load(book)
+    stats = index.refresh()
+    assert (stats.total, stats.parsed, stats.reused) == (3, 3, 0)
+    assert index.entries["chapters/1-basics/1-intro.md"].meta["tags"] == ["agents", "loops"]
+    index.save()
+
+    again = FrontmatterIndex.load(book)
+    stats = again.refresh()
+    assert (stats.parsed, stats.reused, stats.rehashed) == (0, 3, 0)
+    assert again.changed == set()
+
+
+def test_refresh_rehashes_a_touched_file_without_parsing(book):
+    load_index(book)
+    path = book / "chapters/2-context/_index.md"
+    stamp = path.stat().st_mtime_ns + 5_000_000_000
+    os.utime(path, ns=(stamp, stamp))
+
+    index = load_index(book)
+    assert (index.stats.parsed, index.stats.rehashed) == (0, 1)
+    # The new mtime was persisted, so the next run is a plain reuse.
+    assert load_index(book).stats.rehashed == 0
+
+
+def test_refresh_reparses_an_edited_file(book, edit):
+    load_index(book)
+    edit("chapters/2-context/_index.md", "---\ntitle: Context Windows\norder: 2.0.0\n---\n")
+
+    index = load_index(book)
+    assert index.stats.parsed == 1
+    assert index.changed == {"chapters/2-context/_index.md"}
+    assert index.entries["chapters/2-context/_index.md"].title == "Context Windows"
+
+
+def test_refresh_drops_removed_files(book):
+    load_index(book)
+    (book / "chapters/1-basics/1-intro.md").unlink()
+
+    index = load_index(book)
+    assert index.stats.removed == 1
+    assert "chapters/1-basics/1-intro.md" not in index.entries
+    assert "chapters/1-basics/1-intro.md" in index.changed
+
+
+def test_render_toc_follows_order(book):
+    index = load_index(book)
+    text = render_toc(index.ordered(), dt.date(2026, 1, 1))
+    assert "## Part 1: Foundations" in text
+    assert "### Chapter 1: Basics" in text
+    assert text.index("[Introduction: Agents]") < text.index("[Context]")
+
+
+def test_toc_reports_shared_order_keys(book, edit, capsys):
+    edit("chapters/2-context/1-windows.md", "---\ntitle: Windows\norder: 2.0.0\npart: 1\nchapter: 2\n---\n\n# Windows\n")
+    groups = toc.duplicate_orders(load_index(book).ordered())
+    assert [[e.path for e in group] for group in groups] == [
+        ["chapters/2-context/1-windows.md", "chapters/2-context/_index.md"]
+    ]
+    assert toc.run(argparse.Namespace(root=str(book), check=False, stdout=True)) == 1
+    assert "order 2.0.0 is shared by chapters/2-context/1-windows.md, chapters/2-context/_index.md" in capsys.readouterr().err
+
+
+def test_committed_toc_is_current():
+    root = Path(booktools.__file__).parents[1]
+    assert toc.run(argparse.Namespace(root=str(root), check=True, stdout=False)) == 0
+
+
+def test_relative_paths_rejects_paths_outside_the_root(book, capsys):
+    assert relative_paths(book, [str(book / "chapters/1-basics/1-intro.md")], "lint") == ["chapters/1-basics/1-intro.md"]
+    assert relative_paths(book, [str(book / "chapters"), str(book.parent)], "lint") is None
+    assert capsys.readouterr().err == f"lint: {book.parent} is outside {book}\n"
+
+
+@pytest.mark.parametrize("command", ["links", "lint", "code", "related"])
+def test_commands_exit_2_for_paths_outside_the_root(book, command):
+    env = {**os.environ, "PYTHONPATH": str(Path(booktools.__file__).parents[1])}
+    proc = subprocess.run(
+        [sys.executable, "-m", "booktools", "--root", str(book), command, str(book.parent / "elsewhere.md")],
+        capture_output=True,
+        text=True,
+        cwd=book,
+        env=env,
+    )
+    assert proc.returncode == 2
+    assert f"{command}: {book.parent / 'elsewhere.md'} is outside {book}" in proc.stderr
+    assert "Traceback" not in proc.stderr
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import re
+import zipfile
+from html import unescape
+
+import pytest
+
+from booktools.export import plan, write_epub, write_html
+
+_HREF_RE = re.compile(r'<a href="([^"]*)"( class="outside-export")?')
+_ID_RE = re.compile(r' id="([^"]*)"')
+
+
+@pytest.fixture
+def linked_book(book, edit):
+    edit(
+        "chapters/2-context/1-windows.md",
+        "---\ntitle: Windows\norder: 2.1.0\n---\n\n# Windows\n\n## Sizing\n\n"
+        "See [loops](../1-basics/1-intro.md#agent-loops), [tools](../1-basics/1-intro.md#Tools), "
+        "[missing anchor](../1-basics/1-intro.md#gone), [the chapter](_index.md), "
+        "[sizing](#sizing), [notes](../notes/draft.md#todo) and [web](https://example.com).\n",
+    )
+    edit("chapters/notes/draft.md", "# Draft\n\n## TODO\n\nUnordered, so outside the export.\n")
+    return book
+
+
+def test_every_html_link_resolves(linked_book, tmp_path):
+    output = tmp_path / "out" / "nested" / "book.html"
+    output.parent.mkdir(parents=True)
+    order, targets = plan(linked_book)
+    assert write_html(output, linked_book, order, targets, jobs=1) == 4
+
+    page = output.read_text("utf-8")
+    ids = set(_ID_RE.findall(page))
+    links = [(unescape(href), bool(outside)) for href, outside in _HREF_RE.findall(page)]
+    internal = [href for href, outside in links if href.startswith("#")]
+    assert len(internal) >= 5 + len(order)
+    for href in internal:
+        assert href[1:] in ids, href
+    assert "#doc-chapters-1-basics-1-intro--agent-loops" in internal
+    assert "#doc-chapters-1-basics-1-intro--tools" in internal
+
+    outside = [href for href, is_outside in links if is_outside]
+    assert len(outside) == 1
+    path, _, fragment = outside[0].partition("#")
+    assert (output.parent / path).resolve() == (linked_book / "chapters/notes/draft.md").resolve()
+    assert fragment == "todo"
+
+
+def test_every_epub_link_resolves(linked_book, tmp_path):
+    output = tmp_path / "book.epub"
+    order, targets = plan(linked_book)
+    write_epub(output, linked_book, order, targets, jobs=1)
+
+    with zipfile.ZipFile(output) as epub:
+        assert epub.namelist()[0] == "mimetype"
+        assert epub.getinfo("mimetype").compress_type == zipfile.ZIP_STORED
+        pages = {
+            name[len("OEBPS/") :]: epub.read(name).decode("utf-8")
+            for name in epub.namelist()
+            if name.endswith(".xhtml")
+        }
+    ids = {name: set(_ID_RE.findall(text)) for name, text in pages.items()}
+    checked = 0
+    for name, text in pages.items():
+        for href, outside in _HREF_RE.findall(text):
+            href = unescape(href)
+            if outside or "://" in href:
+                continue
+            document, _, anchor = href.partition("#")
+            document = document or name
+            assert document in pages, href
+            assert not anchor or anchor in ids[document], href
+            checked += 1
+    assert checked >= 5 + len(order)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+
+import pytest
+
+from booktools.links import LinkChecker, changed_files
+
+WINDOWS = "chapters/2-context/1-windows.md"
+INTRO = "chapters/1-basics/1-intro.md"
+
+
+def check(book, scope=None):
+    checker = LinkChecker(book, jobs=1)
+    checker.refresh()
+    problems, _ = checker.check(scope)
+    return [(p.path, p.href, p.reason) for p in problems]
+
+
+def test_reports_missing_targets_and_anchors(book, edit):
+    edit(
+        WINDOWS,
+        "# Windows\n\n[ok](../1-basics/1-intro.md#agent-loops) [gone](missing.md) "
+        "[bad](../1-basics/1-intro.md#nope) [web](https://example.com) `[code](skipped.md)`\n",
+    )
+    assert check(book) == [
+        (WINDOWS, "missing.md", "missing target"),
+        (WINDOWS, "../1-basics/1-intro.md#nope", "unknown anchor #nope"),
+    ]
+
+
+def test_renamed_heading_keeps_failing_on_every_run(book, edit):
+    edit(WINDOWS, "# Windows\n\n[loops](../1-basics/1-intro.md#agent-loops)\n")
+    assert check(book) == []
+
+    edit(INTRO, (book / INTRO).read_text("utf-8").replace("## Agent loops", "## Control loops"))
+    for _ in range(2):
+        assert check(book, {INTRO}) == [
+            (WINDOWS, "../1-basics/1-intro.md#agent-loops", "unknown anchor #agent-loops")
+        ]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_changed_files_come_from_git(book, edit):
+    def git(*args):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=book,
+            check=True,
+            capture_output=True,
+        )
+
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-q", "-m", "base")
+    assert changed_files(book) == set()
+
+    edit(INTRO, "# Intro\n")
+    edit(WINDOWS, "# Windows\n")
+    assert changed_files(book) == {INTRO, WINDOWS}
+    git("add", ".")
+    git("commit", "-q", "-m", "edit")
+    # Committing does not hide the change from a gate that compares to the base.
+    assert changed_files(book, "HEAD~1") == {INTRO, WINDOWS}
+    assert changed_files(book) == set()
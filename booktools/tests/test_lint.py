@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+
+from booktools import lint
+from booktools.lint import lint_text, lint_tree
+
+CLEAN = """---
+title: Clean
+description: A clean entry.
+created: 2026-01-01
+last_updated: 2026-01-02
+tags: [style]
+order: 1.2.0
+part: 1
+chapter: 2
+section: 0
+---
+
+# Clean
+
+Retrieval-augmented generation (RAG) grounds answers in sources.
+
+## Connections
+
+- [Basics](../1-basics/_index.md)
+"""
+
+
+def rules(text):
+    return [(d.rule, d.line) for d in lint_text(text)]
+
+
+def defined(body):
+    return [d.subject for d in lint_text(body) if d.rule == "define-on-first-use"]
+
+
+def test_clean_entry_passes():
+    assert lint_text(CLEAN, "clean.md") == []
+
+
+def test_reports_each_rule_once_per_line():
+    text = CLEAN.replace("grounds answers", "perhaps grounds our answers").replace(
+        "created: 2026-01-01", "created: 2026-13-01"
+    )
+    assert set(rules(text)) == {("frontmatter", 1), ("no-hedging", 15), ("third-person", 15)}
+
+
+def test_connections_section_needs_a_link():
+    text = CLEAN.replace("- [Basics](../1-basics/_index.md)", "Nothing yet.")
+    assert ("connections-section", 17) in rules(text)
+
+
+def test_acronyms_must_be_defined():
+    assert defined("An MCP server exposes tools.") == ["MCP"]
+    assert defined("Model Context Protocol (MCP) servers expose tools.") == []
+    assert defined("MCP (Model Context Protocol) servers expose tools.") == []
+    assert defined("Every API call is logged.") == []
+
+
+def test_capitalised_emphasis_is_not_an_acronym():
+    assert defined("Agents must NEVER push.") == []
+    assert defined("Mark the file DO NOT UPDATE.") == []
+    assert defined("Always check first.\n\nCHECK the plan, then run MCP tools.") == ["MCP"]
+
+
+def test_corpus_vocabulary_clears_emphasis_used_elsewhere(book, edit):
+    edit("chapters/1-basics/2-emphasis.md", "# Emphasis\n\nCommands must APPEND to the log, not MCP.\n")
+    edit("chapters/1-basics/3-append.md", "# Append\n\nWriters append entries.\n")
+
+    assert defined((book / "chapters/1-basics/2-emphasis.md").read_text("utf-8")) == ["APPEND", "MCP"]
+    results, _ = lint_tree(book, jobs=1)
+    found = [d["subject"] for d in results["chapters/1-basics/2-emphasis.md"] if d["rule"] == "define-on-first-use"]
+    assert found == ["MCP"]
+
+
+def test_tree_results_are_cached(book):
+    _, evaluated = lint_tree(book, jobs=1)
+    assert evaluated == 3
+    again, evaluated = lint_tree(book, jobs=1)
+    assert evaluated == 0
+    assert set(again) == {"chapters/1-basics/_index.md", "chapters/1-basics/1-intro.md", "chapters/2-context/_index.md"}
+
+
+def test_missing_paths_are_skipped(book, monkeypatch, capsys):
+    monkeypatch.chdir(book)
+    args = argparse.Namespace(root=str(book), paths=["chapters/gone.md"], jobs=1, rule=None, json=False)
+    assert lint.run(args) == 0
+    assert "skipping chapters/gone.md: no such file" in capsys.readouterr().err
+
+
+def _define_subjects(results, rel):
+    return [d["subject"] for d in results[rel] if d["rule"] == "define-on-first-use"]
+
+
+def test_deleted_files_no_longer_clear_emphasis(book, edit):
+    edit("chapters/1-basics/2-emphasis.md", "# Emphasis\n\nCommands must APPEND to the log.\n")
+    edit("chapters/1-basics/3-append.md", "# Append\n\nWriters append entries.\n")
+    warm, _ = lint_tree(book, jobs=1)
+    assert _define_subjects(warm, "chapters/1-basics/2-emphasis.md") == []
+
+    (book / "chapters/1-basics/3-append.md").unlink()
+    warm, evaluated = lint_tree(book, jobs=1)
+    assert evaluated == 0
+    assert _define_subjects(warm, "chapters/1-basics/2-emphasis.md") == ["APPEND"]
+    (book / ".booktools" / lint.CACHE_FILE).unlink()
+    cold, _ = lint_tree(book, jobs=1)
+    assert cold == warm
+
+
+def test_single_path_agrees_with_the_full_tree(book, edit):
+    rel = "chapters/1-basics/2-emphasis.md"
+    edit(rel, "# Emphasis\n\nCommands must APPEND to the log, not MCP.\n")
+    edit("chapters/1-basics/3-append.md", "# Append\n\nWriters append entries.\n")
+
+    single, evaluated = lint_tree(book, [rel], jobs=1)
+    assert list(single) == [rel]
+    # Only the asked-for file counts, though every stale source was linted.
+    assert evaluated == 1
+    full, evaluated = lint_tree(book, jobs=1)
+    assert evaluated == 0
+    assert single[rel] == full[rel]
+    assert _define_subjects(full, rel) == ["MCP"]
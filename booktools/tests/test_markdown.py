@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from booktools import markdown
+from booktools.markdown import Slugger, slugify
+
+
+def test_slugify_follows_github_rules():
+    assert slugify("Hello, World!") == "hello-world"
+    assert slugify("The `scan()` Loop") == "the-scan-loop"
+    assert slugify("See [Links](x.md) Here") == "see-links-here"
+
+
+def test_slugger_suffixes_duplicates():
+    slugger = Slugger()
+    assert [slugger.slug(t) for t in ("Setup", "Setup", "Setup")] == ["setup", "setup-1", "setup-2"]
+
+
+def test_slugger_skips_suffixes_already_taken():
+    slugger = Slugger()
+    assert [slugger.slug(t) for t in ("Setup 1", "Setup", "Setup")] == ["setup-1", "setup", "setup-2"]
+
+
+def test_scan_ignores_fences_and_code_spans():
+    lines = [
+        "# Title",
+        "See [one](one.md) and `[two](two.md)`.",
+        "```markdown",
+        "# Not a heading",
+        "[three](three.md)",
+        "```",
+        "## Title",
+        "![image](pic.png) [four](four.md#part)",
+    ]
+    headings, links = markdown.scan(lines, first_line=5)
+    assert [(h.line, h.level, h.slug) for h in headings] == [(5, 1, "title"), (11, 2, "title-1")]
+    assert [(link.line, link.href) for link in links] == [(6, "one.md"), (12, "four.md#part")]
+
+
+
+def test_iter_fences_reports_unclosed_blocks():
+    lines = ["~~~python", "    x = 1", "~~~", "", "  ```js", "  let y;"]
+    fences = list(markdown.iter_fences(lines))
+    assert [(f.line, f.lang, f.source, f.closed) for f in fences] == [
+        (1, "python", "    x = 1\n", True),
+        (5, "js", "let y;\n", False),
+    ]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import random
+
+from booktools.overlap import find_clusters, iter_paragraphs, load_paragraphs, signature, similarity
+
+PLANTED = (
+    "Checkpointing every tool result to durable storage lets a long-running agent resume after "
+    "a crash without replaying expensive model calls, and it gives reviewers an exact record "
+    "of which observations shaped each decision along the way."
+)
+WORDS = """budget window context agent review planner cache token latency memory schedule
+    retry queue worker shard index vector prompt eval metric trace span log alert""".split()
+
+
+def filler(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(40)) + "."
+
+
+def test_finds_a_planted_duplicate_paragraph(book, edit):
+    rng = random.Random(3)
+    edit(
+        "chapters/1-basics/2-durability.md",
+        f"# Durability\n\n{filler(rng)}\n\n{PLANTED}\n\n{filler(rng)}\n",
+    )
+    # Same paragraph in another chapter, re-wrapped, with markup and one word changed.
+    copied = PLANTED.replace("crash", "failure").replace("durable storage", "**durable storage**")
+    wrapped = copied[:90] + "\n" + copied[90:]
+    edit(
+        "chapters/2-context/2-resume.md",
+        f"# Resume\n\n{filler(rng)}\n\n```text\n{PLANTED}\n```\n\n{wrapped}\n\n{filler(rng)}\n",
+    )
+
+    paragraphs, rehashed = load_paragraphs(book, jobs=1)
+    assert rehashed == 5
+    clusters, _ = find_clusters(paragraphs, threshold=0.5, cross_file=True)
+    assert [[p.location for p in c.members] for c in clusters] == [
+        ["chapters/1-basics/2-durability.md:5", "chapters/2-context/2-resume.md:9"]
+    ]
+    assert clusters[0].similarity >= 0.5
+
+    _, rehashed = load_paragraphs(book, jobs=1)
+    assert rehashed == 0
+
+
+def test_paragraphs_skip_code_fences_and_split_on_headings():
+    text = "# A\n\none\ntwo\n\n```\ncode\n```\nthree\n## B\nfour\n"
+    assert list(iter_paragraphs(text)) == [(3, "A", "one two"), (9, "A", "three"), (11, "B", "four")]
+
+
+def test_signature_similarity_tracks_overlap():
+    words = PLANTED.lower().replace(",", "").replace(".", "").split()
+    assert similarity(signature(words), signature(list(words))) == 1.0
+    assert similarity(signature(words), signature(list(reversed(words)))) < 0.2
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import math
+import random
+
+import pytest
+
+from booktools import related
+from booktools.related import MIN_SCORE, _score_rows_python, build_vectors
+
+VOCABULARY = [f"w{n}" for n in range(300)]
+
+
+def random_vectors(seed=11, files=12, sections=6):
+    rng = random.Random(seed)
+    store = {}
+    for f in range(files):
+        rows = []
+        for s in range(sections):
+            # A shared theme per file pair keeps plenty of scores above MIN_SCORE.
+            theme = VOCABULARY[(f // 2) * 20 : (f // 2) * 20 + 20]
+            terms = rng.sample(VOCABULARY, rng.randint(5, 40)) + rng.sample(theme, 8)
+            tf = {t: rng.randint(1, 6) for t in terms}
+            rows.append({"length": sum(tf.values()), "heading": f"S{s}", "slug": f"s{s}", "line": s + 1, "tf": tf})
+        store[f"chapters/{f}.md"] = {"sections": rows}
+    tags = {f"chapters/{f}.md": ["even" if f % 2 == 0 else "odd"] for f in range(files)}
+    return build_vectors(store, tags)
+
+
+def brute_force(vectors, i):
+    own = vectors.path(i)
+    scores = []
+    for j, other in enumerate(vectors.rows):
+        score = sum(w * other.get(t, 0.0) for t, w in vectors.rows[i].items())
+        if vectors.path(j) != own and score >= MIN_SCORE:
+            scores.append((j, score))
+    return sorted(scores, key=lambda h: (-h[1], h[0]))
+
+
+def assert_same(left, right):
+    assert len(left) == len(right)
+    for a, b in zip(left, right):
+        assert [j for j, _ in a] == [j for j, _ in b]
+        assert [s for _, s in a] == pytest.approx([s for _, s in b], abs=1e-9)
+
+
+def test_rows_are_unit_length():
+    vectors = random_vectors()
+    for row in vectors.rows:
+        # Terms unique to one section are dropped after normalising.
+        assert math.sqrt(sum(w * w for w in row.values())) <= 1.0 + 1e-9
+
+
+def test_python_scores_match_brute_force():
+    vectors = random_vectors()
+    rows = list(range(len(vectors.rows)))
+    assert_same(_score_rows_python(vectors, rows), [brute_force(vectors, i) for i in rows])
+    limited = _score_rows_python(vectors, rows, 5)
+    assert_same(limited, [brute_force(vectors, i)[:5] for i in rows])
+
+
+@pytest.mark.parametrize("limit", [None, 1, related.TOP_K])
+@pytest.mark.parametrize("block_cells", [1, 97, 1 << 22])
+def test_numpy_scores_match_python(monkeypatch, limit, block_cells):
+    if related.numpy is None:
+        pytest.skip("NumPy is not installed")
+    monkeypatch.setattr(related, "BLOCK_CELLS", block_cells)
+    vectors = random_vectors()
+    rows = list(range(0, len(vectors.rows), 3))
+    assert_same(related.score_rows(vectors, rows, limit), _score_rows_python(vectors, rows, limit))
+
+
+def test_suggests_a_missing_connection(book, edit):
+    shared = " ".join(f"checkpoint durable storage resume crash replay journal {n}" for n in range(6))
+    for rel in ("chapters/1-basics/2-state.md", "chapters/2-context/2-resume.md"):
+        edit(rel, f"---\ntitle: {rel}\n---\n\n# Title\n\n## Durable state\n\n{shared}\n\n## Connections\n\n")
+    neighbours = related.refresh(book)
+    pairs = {(s.path, s.target) for s in related.suggest(book, neighbours)}
+    assert ("chapters/1-basics/2-state.md", "chapters/2-context/2-resume.md") in pairs
+
+    edit(
+        "chapters/1-basics/2-state.md",
+        (book / "chapters/1-basics/2-state.md").read_text("utf-8") + "- [Resume](../2-context/2-resume.md)\n",
+    )
+    neighbours = related.refresh(book)
+    pairs = {(s.path, s.target) for s in related.suggest(book, neighbours)}
+    assert ("chapters/1-basics/2-state.md", "chapters/2-context/2-resume.md") not in pairs
+
+
+def write_corpus(edit, files=30, sections=3, seed=5):
+    """``files`` entries whose sections share themed vocabulary across files."""
+    rng = random.Random(seed)
+    bodies = {}
+    for f in range(files):
+        parts = []
+        for s in range(sections):
+            theme = [f"theme{(f + s) % 12}x{n}" for n in range(15)]
+            words = rng.sample(theme, 10) + [f"word{rng.randrange(400)}x" for _ in range(20)]
+            parts.append((f"Section {s}", " ".join(words)))
+        rel = f"chapters/3-many/{f}-entry.md"
+        bodies[rel] = parts
+        edit(rel, render_entry(rel, parts))
+    return bodies
+
+
+def render_entry(rel, parts):
+    sections = "".join(f"## {heading}\n\n{body}\n\n" for heading, body in parts)
+    return f"---\ntitle: {rel}\ntags: [many]\n---\n\n# Entry\n\n{sections}"
+
+
+def test_incremental_refresh_matches_a_rebuild(book, edit):
+    bodies = write_corpus(edit)
+    related.refresh(book)
+
+    # Repeating a paragraph changes term frequencies but no term's document
+    # frequency, so the IDF weights of the unchanged pairs stay exact.
+    rel = "chapters/3-many/4-entry.md"
+    heading, body = bodies[rel][1]
+    bodies[rel][1] = (heading, f"{body}\n\n{body} {body}")
+    edit(rel, render_entry(rel, bodies[rel]))
+    incremental = related.refresh(book)
+    assert not incremental.rebuilt
+    # Sections outside the edited file and its neighbours are merged, not re-ranked.
+    assert len(bodies[rel]) < incremental.rescored < len(incremental.sections) // 2
+
+    rebuilt = related.refresh(book, rebuild=True)
+    assert rebuilt.rebuilt
+    assert incremental.sections.keys() == rebuilt.sections.keys()
+    for key, entry in rebuilt.sections.items():
+        assert [k for k, _ in incremental.sections[key][4]] == [k for k, _ in entry[4]], key
+        assert [s for _, s in incremental.sections[key][4]] == pytest.approx([s for _, s in entry[4]], abs=1e-4)
+
+
+def test_rubric_flags_only_the_off_topic_mapping(book, edit):
+    write_corpus(edit)
+    # Terms found in a single section carry no weight, so the theme needs two entries.
+    for rel in ("chapters/2-context/_index.md", "chapters/2-context/1-budgets.md"):
+        edit(
+            rel,
+            "---\ntitle: Context\n---\n\n# Context\n\n## Budgets\n\n"
+            + "A context window budget decides which tokens enter the window. " * 3,
+        )
+    edit(
+        "RUBRIC.md",
+        "# Rubric\n\n## Dimension 1: Context windows\n\n"
+        "How well a context window is budgeted: context, windows, tokens, budget.\n\n"
+        "- **Level 1**: [Context](chapters/2-context/_index.md)\n"
+        "- **Level 2**: [Entry](chapters/3-many/0-entry.md)\n\n"
+        "## Notes\n\nNothing here.\n",
+    )
+    neighbours = related.refresh(book, need_vectors=True)
+    mappings, _ = related.check_rubric(book, neighbours.vectors)
+    stale = {m.target: m.stale for m in mappings}
+    assert stale == {"chapters/2-context/_index.md": False, "chapters/3-many/0-entry.md": True}
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+
+from booktools import search
+from booktools.search import SearchIndex
+
+
+def load_sections(book):
+    store = json.loads((book / ".booktools/search" / search.SECTIONS_FILE).read_text("utf-8"))
+    return [(rel, section) for rel, info in store["files"].items() for section in info["sections"]]
+
+
+def bm25(docs, query):
+    """Reference BM25 over the cached term counts, no index involved."""
+    avgdl = sum(s["length"] for _, s in docs) / len(docs)
+    scores = {}
+    for term in search.tokenize(query):
+        df = sum(term in s["tf"] for _, s in docs)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for doc_id, (_, section) in enumerate(docs):
+            tf = section["tf"].get(term)
+            if tf:
+                denominator = tf + search.K1 * (1 - search.B + search.B * section["length"] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (search.K1 + 1) / denominator
+    return scores
+
+
+def test_index_round_trips_through_mmap(book):
+    report = search.refresh(book)
+    docs = load_sections(book)
+    assert report.rebuilt and report.sections == len(docs)
+
+    with SearchIndex(book / ".booktools/search" / search.INDEX_FILE) as index:
+        assert index.size == len(docs)
+        assert index.avgdl == pytest.approx(sum(s["length"] for _, s in docs) / len(docs))
+        for doc_id, (rel, section) in enumerate(docs):
+            assert index.record(doc_id) == (
+                rel,
+                section["level"],
+                section["heading"],
+                section["slug"],
+                section["line"],
+                section["start"],
+                section["end"],
+            )
+        for term in {term for _, s in docs for term in s["tf"]}:
+            assert index._lookup(term) >= 0
+        assert index._lookup("zzzz") == -1
+        for query in ("agent loops", "context windows", "tools reach"):
+            expected = bm25(docs, query)
+            assert index.scores(search.tokenize(query)) == pytest.approx(expected)
+
+
+def test_search_ranks_the_matching_section_first(book):
+    search.refresh(book)
+    with SearchIndex(book / ".booktools/search" / search.INDEX_FILE) as index:
+        hit = index.search("agent loop model call", limit=1)[0]
+    assert (hit.path, hit.slug) == ("chapters/1-basics/1-intro.md", "agent-loops")
+    data = (book / hit.path).read_bytes()
+    assert data[hit.start : hit.end].startswith(b"## Agent loops")
+
+
+def test_refresh_retokenizes_only_changed_files(book, edit):
+    search.refresh(book)
+    assert not search.refresh(book).rebuilt
+
+    edit("chapters/2-context/_index.md", "---\ntitle: Context\n---\n\n# Context\n\nBudgets and windows.\n")
+    report = search.refresh(book)
+    assert (report.rebuilt, report.retokenized) == (True, 1)
+    with SearchIndex(book / ".booktools/search" / search.INDEX_FILE) as index:
+        assert index.search("budgets")[0].path == "chapters/2-context/_index.md"
+
+
+def test_last_line_counts_without_a_trailing_newline():
+    with_newline = search.tokenize_file(b"# Title\n\n## Budgets\n\nwindow budget\n")
+    without = search.tokenize_file(b"# Title\n\n## Budgets\n\nwindow budget")
+    assert without == [{**s, "end": s["end"] - 1} if s["heading"] == "Budgets" else s for s in with_newline]
+    assert without[-1]["tf"] == {"budget": search.HEADING_WEIGHT + 1, "window": 1}
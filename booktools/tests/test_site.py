@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from booktools.site import SiteBuilder
+
+INTRO = "chapters/1-basics/1-intro.md"
+WINDOWS = "chapters/2-context/1-windows.md"
+
+
+def build(book):
+    return SiteBuilder(book, book / "_site", jobs=1).build()
+
+
+def add_linking_page(edit):
+    edit(
+        WINDOWS,
+        "---\ntitle: Windows\norder: 2.1.0\n---\n\n# Windows\n\n"
+        "Windows hold [agent loops](../1-basics/1-intro.md#agent-loops).\n",
+    )
+
+
+def test_dependents_include_linking_pages_and_neighbours(book, edit):
+    add_linking_page(edit)
+    builder = SiteBuilder(book, book / "_site", jobs=1)
+    builder.scan()
+    assert builder.dependents()[INTRO] == {
+        "chapters/1-basics/_index.md",
+        "chapters/2-context/_index.md",
+        WINDOWS,
+    }
+
+
+def test_renaming_a_heading_rerenders_pages_that_link_to_it(book, edit):
+    add_linking_page(edit)
+    first = build(book)
+    assert first.rendered == first.pages
+
+    edit(INTRO, (book / INTRO).read_text("utf-8").replace("## Agent loops", "## Control loops"))
+    report = build(book)
+    assert set(report.timings) == {
+        INTRO,
+        "chapters/1-basics/_index.md",
+        "chapters/2-context/_index.md",
+        WINDOWS,
+    }
+    assert 'id="control-loops"' in (book / "_site/chapters/1-basics/1-intro.html").read_text("utf-8")
+
+
+def test_body_edit_rerenders_only_that_page(book, edit):
+    add_linking_page(edit)
+    build(book)
+
+    edit(INTRO, (book / INTRO).read_text("utf-8") + "\nOne more sentence.\n")
+    report = build(book)
+    assert set(report.timings) == {INTRO}
+    assert report.unchanged == report.pages - 1
+
+
+def test_unchanged_tree_renders_nothing(book):
+    build(book)
+    report = build(book)
+    assert (report.scanned, report.rendered, report.unchanged) == (0, 0, report.pages)
+
+
+def test_anchor_case_does_not_break_links(book, edit):
+    edit(
+        WINDOWS,
+        "---\ntitle: Windows\norder: 2.1.0\n---\n\n# Windows\n\n"
+        "Windows hold [agent loops](../1-basics/1-intro.md#Agent-Loops).\n",
+    )
+    build(book)
+    page = (book / "_site/chapters/2-context/1-windows.html").read_text("utf-8")
+    assert "broken-link" not in page
+    assert "1-intro.html#agent-loops" in page
@@ -0,0 +1,110 @@
+"""``/book:toc``: regenerate TABLE_OF_CONTENTS.md from the frontmatter index."""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sys
+import time
+from itertools import groupby
+from pathlib import Path
+
+from booktools.corpus import Entry, knowledge_base_root, load_index
+
+TOC_FILE = "TABLE_OF_CONTENTS.md"
+_GENERATED_PREFIX = "*Generated: "
+
+
+def render_toc(entries: list[Entry], generated: dt.date) -> str:
+    """Render the table of contents for ``entries`` (already in reading order).
+
+    Parts come from ``part``/``part_title``; chapter headings take the title
+    of the chapter's ``section: 0`` entry.
+    """
+    lines = ["# Table of Contents", "", f"{_GENERATED_PREFIX}{generated.isoformat()}*"]
+    for part, in_part in groupby(entries, key=lambda e: e.meta.get("part")):
+        in_part = list(in_part)
+        part_title = next(
+            (e.meta["part_title"] for e in in_part if e.meta.get("part_title")), ""
+        )
+        heading = f"## Part {part}: {part_title}" if part_title else f"## Part {part}"
+        lines += ["", "---", "", heading]
+        for chapter, in_chapter in groupby(in_part, key=lambda e: e.meta.get("chapter")):
+            in_chapter = list(in_chapter)
+            index_entry = next(
+                (e for e in in_chapter if e.meta.get("section") == 0), in_chapter[0]
+            )
+            lines += ["", f"### Chapter {chapter}: {index_entry.title}", ""]
+            lines += [f"- [{e.title}]({e.path})" for e in in_chapter]
+    return "\n".join(lines) + "\n"
+
+
+def duplicate_orders(entries: list[Entry]) -> list[list[Entry]]:
+    """Groups of ``entries`` (in reading order) that share an ``order`` key.
+
+    Their relative position in the TOC would depend only on their paths.
+    """
+    groups = [list(group) for _, group in groupby(entries, key=lambda e: e.order)]
+    return [group for group in groups if len(group) > 1]
+
+
+def _strip_generated(text: str) -> str:
+    return "\n".join(
+        line for line in text.splitlines() if not line.startswith(_GENERATED_PREFIX)
+    )
+
+
+def write_toc(root: Path, text: str) -> bool:
+    """Write ``text`` unless only the generation date would change."""
+    target = root / TOC_FILE
+    try:
+        current = target.read_text("utf-8")
+    except FileNotFoundError:
+        current = None
+    if current is not None and _strip_generated(current) == _strip_generated(text):
+        return False
+    target.write_text(text, "utf-8")
+    return True
+
+
+def run(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    root = knowledge_base_root(args.root)
+    index = load_index(root)
+    entries = index.ordered()
+    text = render_toc(entries, dt.date.today())
+    duplicates = duplicate_orders(entries)
+    for group in duplicates:
+        paths = ", ".join(e.path for e in group)
+        print(f"toc: order {group[0].meta['order']} is shared by {paths}", file=sys.stderr)
+    if args.check:
+        target = root / TOC_FILE
+        current = target.read_text("utf-8") if target.exists() else ""
+        stale = _strip_generated(current) != _strip_generated(text)
+        status = "stale" if stale else "up to date"
+    elif args.stdout:
+        sys.stdout.write(text)
+        stale, status = False, "printed"
+    else:
+        stale = False
+        status = "written" if write_toc(root, text) else "unchanged"
+    elapsed = (time.perf_counter() - started) * 1000
+    print(
+        f"toc: {status}; index {index.stats.summary()}; total {elapsed:.1f} ms",
+        file=sys.stderr,
+    )
+    return 1 if stale or duplicates else 0
+
+
+def register(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "toc", help="regenerate TABLE_OF_CONTENTS.md from frontmatter"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--check", action="store_true", help="exit 1 if the TOC is out of date"
+    )
+    mode.add_argument(
+        "--stdout", action="store_true", help="print the TOC instead of writing it"
+    )
+    parser.set_defaults(func=run)